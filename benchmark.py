@@ -0,0 +1,287 @@
+"""
+reidentify.py의 성능 측정.
+bob_medical.csv와 같은 형태의 마스킹된 의료 데이터와 facebook.db와 같은 narrow table 형태의 크롤링 데이터를
+정해진 seed로 생성하고, 불러오기, mergeable, merge, join, find의 처리 속도와 최대 메모리 사용량을 JSON으로 출력한다.
+
+    python benchmark.py --sizes 1000,10000,100000 --output result.json
+
+각 측정은 별도의 프로세스에서 실행되므로 peak_rss_kb는 그 측정(데이터 준비 포함)만의 최대 RSS이다.
+setup_rss_kb는 측정 직전의 RSS이다.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import reidentify
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BENCHMARKS = ('get_dataset_from_csv', 'get_dataset_from_sqlite_narrecord_table', 'mergeable', 'merge', 'join', 'find')
+
+FAMILY_NAMES = '김이박최정강조윤장임한오서신권황안송류홍'
+GIVEN_NAME_CHARS = '민서준지현우진수영예도하윤성은재유가연승희경호태'
+TRACKS = ('취약점분석', '보안컨설팅', '디지털포렌식', '보안제품개발', '정보보호특기병')
+EMAIL_DOMAINS = ('gmail.com', 'naver.com', 'daum.net', 'hanmail.net', 'nate.com')
+SCHOOLS = ('서울대학교', '고려대학교', '연세대학교', '한양대학교', '경북대학교', '부산대학교', '전남대학교', '동아대학교',
+           '선린인터넷고등학교', '한국디지털미디어고등학교', '대구가톨릭대학교', '서울과학기술대학교', '검정고시')
+DISEASES = ('고혈압', '저혈압', '폐렴', '위암', '신종플루', '당뇨')
+WORKPLACES = ("한국정보기술연구원 'Best of the Best'", '삼성전자', 'LG전자', '네이버', '카카오', '안랩')
+
+
+def generate_people(count, seed):
+    """
+    두 데이터셋이 공유하는 가상의 인물들을 만든다.
+    :param count: 인물 수
+    :param seed: 난수 seed
+    :return: dict의 list. 키: 이름, 성별, 생년월일, 전화번호, 트랙, 이메일, 학교, 질병, 직장
+    """
+    rng = random.Random(seed)
+    people = []
+    for _ in range(count):
+        people.append({
+            '이름': rng.choice(FAMILY_NAMES) + rng.choice(GIVEN_NAME_CHARS) + rng.choice(GIVEN_NAME_CHARS),
+            '성별': 'M' if rng.random() < 0.85 else 'F',
+            '생년월일': '{:04d}{:02d}{:02d}'.format(rng.randint(1985, 2001), rng.randint(1, 12), rng.randint(1, 28)),
+            '전화번호': '010-{:04d}-{:04d}'.format(rng.randrange(10000), rng.randrange(10000)),
+            '트랙': rng.choice(TRACKS),
+            '이메일': rng.choice(EMAIL_DOMAINS),
+            '학교': rng.choice(SCHOOLS),
+            '질병': rng.choice(DISEASES),
+            '직장': rng.choice(WORKPLACES),
+        })
+    return people
+
+
+def write_medical_csv(file_name, people):
+    """
+    bob_medical.csv와 같이 이름, 생년월일, 전화번호를 마스킹한 csv 파일을 만든다.
+    """
+    with open(file_name, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('이름', '성별', '생년월일', '전화번호', '트랙', '이메일', '학교', '질병'))
+        for person in people:
+            writer.writerow((person['이름'][0] + '**', person['성별'], person['생년월일'][:4] + '****',
+                             '***-****-' + person['전화번호'][-4:], person['트랙'], person['이메일'], person['학교'],
+                             person['질병']))
+
+
+def write_crawl_sqlite(file_name, people, seed):
+    """
+    facebook.db와 같은 narrow table(fb(url, key, value))을 만든다. 일부 속성은 일부 인물에게만 있다.
+    """
+    rng = random.Random(seed + 1)
+    connection = sqlite3.connect(file_name)
+    try:
+        connection.execute('CREATE TABLE fb (url TEXT, key TEXT, value TEXT)')
+        rows = []
+        for number, person in enumerate(people):
+            url = 'https://www.facebook.com/profile.php?id={}&sk=about&'.format(100000000000 + number)
+            rows.append((url, 'url', url))
+            rows.append((url, '이름', person['이름']))
+            if rng.random() < 0.9:
+                rows.append((url, '성별', '남성' if person['성별'] == 'M' else '여성'))
+            if rng.random() < 0.1:
+                rows.append((url, '휴대폰', person['전화번호']))
+            if rng.random() < 0.6:
+                rows.append((url, '학력', person['학교']))
+            if rng.random() < 0.2:
+                rows.append((url, '학력', rng.choice(SCHOOLS)))
+            if rng.random() < 0.8:
+                rows.append((url, '직장', person['직장']))
+        connection.executemany('INSERT INTO fb VALUES (?, ?, ?)', rows)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def generate_files(directory, size, seed):
+    """
+    :return: (csv 파일 이름, sqlite 파일 이름)
+    """
+    people = generate_people(size, seed)
+    csv_file_name = os.path.join(directory, 'medical_{}.csv'.format(size))
+    sqlite_file_name = os.path.join(directory, 'crawl_{}.db'.format(size))
+    write_medical_csv(csv_file_name, people)
+    write_crawl_sqlite(sqlite_file_name, people, seed)
+    return csv_file_name, sqlite_file_name
+
+
+def load_medical(csv_file_name):
+    medical_dataset = reidentify.get_dataset_from_csv(csv_file_name)
+    for record in medical_dataset:
+        record['이름'] = reidentify.MaskedContent(record['이름'], align='left')
+        record['전화번호'] = reidentify.MaskedContent(record['전화번호'], align='left')
+        record['생년월일'] = reidentify.MaskedContent(record['생년월일'], align='left')
+        if record['학교'] == '검정고시':
+            del record['학교']
+    return medical_dataset
+
+
+def load_crawl(sqlite_file_name):
+    key_aliases = {'휴대폰': '전화번호', '기타 전화번호': '전화번호', '학력': '학교'}
+    return list(reidentify.iter_dataset_from_sqlite_narrecord_table(sqlite_file_name, 'fb', 'url', 'key', 'value',
+                                                                    key_aliases=key_aliases))
+
+
+def peak_rss_kb():
+    """
+    :return: 이 프로세스의 최대 RSS(KB). 측정할 수 없으면 None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS는 바이트 단위
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def current_rss_kb():
+    """
+    :return: 이 프로세스의 현재 RSS(KB). 측정할 수 없으면 None
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def run_benchmark(name, size, csv_file_name, sqlite_file_name, options):
+    """
+    측정 하나를 실행한다.
+    :return: dict. 측정 결과
+    """
+    # 측정마다 덧붙이는 값
+    extra = {}
+    if name == 'get_dataset_from_csv':
+        setup_rss = current_rss_kb()
+        start = time.perf_counter()
+        rows = len(reidentify.get_dataset_from_csv(csv_file_name))
+    elif name == 'get_dataset_from_sqlite_narrecord_table':
+        setup_rss = current_rss_kb()
+        start = time.perf_counter()
+        rows = len(reidentify.get_dataset_from_sqlite_narrecord_table(sqlite_file_name, 'fb', 'url', 'key', 'value'))
+    elif name in ('mergeable', 'merge'):
+        medical_dataset = load_medical(csv_file_name)
+        crawl_dataset = load_crawl(sqlite_file_name)
+        pairs = [(medical_record[attribute_name], crawl_record[attribute_name])
+                 for medical_record, crawl_record in zip(medical_dataset, crawl_dataset)
+                 for attribute_name in ('이름', '학교', '전화번호')
+                 if attribute_name in medical_record and attribute_name in crawl_record]
+        setup_rss = current_rss_kb()
+        start = time.perf_counter()
+        if name == 'mergeable':
+            for content1, content2 in pairs:
+                reidentify.mergeable(content1, content2)
+        else:
+            # merge()는 mergeable한 값만 합친다
+            for content1, content2 in pairs:
+                if reidentify.mergeable(content1, content2):
+                    reidentify.merge(content1, content2)
+        rows = len(pairs)
+    elif name == 'join':
+        medical_dataset = load_medical(csv_file_name)[:options['join_release_rows']]
+        crawl_dataset = load_crawl(sqlite_file_name)
+        setup_rss = current_rss_kb()
+        join_stats = reidentify.JoinStats()
+        start = time.perf_counter()
+        reidentify.join(medical_dataset, crawl_dataset, blocking=options['join_mode'] == 'blocking',
+                        vectorized=options['join_mode'] == 'vectorized', stats=join_stats)
+        rows = len(crawl_dataset)
+        extra['join_stats'] = {'pairs_considered': join_stats.pairs_considered,
+                               'pairs_matched': join_stats.pairs_matched}
+    elif name == 'find':
+        medical_dataset = load_medical(csv_file_name)[:options['join_release_rows']]
+        crawl_dataset = load_crawl(sqlite_file_name)
+        joined_dataset = reidentify.join(medical_dataset, crawl_dataset, blocking=True)
+        queries = [{'이름': record['이름'], '생년월일': record['생년월일'], '전화번호': record['전화번호']}
+                   for record in medical_dataset[:options['find_queries']]]
+        setup_rss = current_rss_kb()
+        start = time.perf_counter()
+        for query in queries:
+            reidentify.find(joined_dataset, query)
+        # 질의마다 joined_dataset 전체를 훑는다
+        rows = len(queries) * len(joined_dataset)
+    else:
+        raise ValueError('unknown benchmark: {}'.format(name))
+    seconds = time.perf_counter() - start
+    return {
+        'benchmark': name,
+        'size': size,
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_sec': rows / seconds if seconds > 0 else None,
+        'setup_rss_kb': setup_rss,
+        'peak_rss_kb': peak_rss_kb(),
+        'options': options,
+        **extra
+    }
+
+
+def run_isolated(name, size, csv_file_name, sqlite_file_name, options):
+    """
+    측정을 별도의 프로세스에서 실행하여 최대 RSS가 다른 측정의 영향을 받지 않게 한다.
+    """
+    command = [sys.executable, os.path.abspath(__file__), '--run-one', name, str(size), csv_file_name,
+               sqlite_file_name, json.dumps(options)]
+    # stdout의 마지막 줄이 측정 결과다
+    completed = subprocess.run(command, stdout=subprocess.PIPE, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(completed.stdout.decode('utf-8').splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='reidentify.py 성능 측정')
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='생성할 데이터 크기(인물 수)들. 쉼표로 구분한다. e.g. 1000,10000,100000,1000000')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS), help='실행할 측정들. 쉼표로 구분한다.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--join-mode', choices=('nested', 'blocking', 'vectorized'), default='blocking')
+    parser.add_argument('--join-release-rows', type=int, default=1000,
+                        help='join, find에 사용할 마스킹된 의료 데이터의 최대 행 수')
+    parser.add_argument('--find-queries', type=int, default=20, help='find에서 실행할 질의 수')
+    parser.add_argument('--output', help='결과 JSON을 저장할 파일 이름. 없으면 표준 출력으로 출력한다.')
+    parser.add_argument('--run-one', nargs=5, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_one:
+        name, size, csv_file_name, sqlite_file_name, options = args.run_one
+        result = run_benchmark(name, int(size), csv_file_name, sqlite_file_name, json.loads(options))
+        print(json.dumps(result))
+        return
+
+    options = {'join_mode': args.join_mode, 'join_release_rows': args.join_release_rows,
+               'find_queries': args.find_queries}
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (int(size) for size in args.sizes.split(',')):
+            csv_file_name, sqlite_file_name = generate_files(directory, size, args.seed)
+            for name in args.benchmarks.split(','):
+                results.append(run_isolated(name, size, csv_file_name, sqlite_file_name, options))
+                print('{benchmark} size={size}: {seconds:.3f}s'.format(**results[-1]), file=sys.stderr)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
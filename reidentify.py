@@ -1,10 +1,33 @@
 import sqlite3
+import argparse
 import csv
+import heapq
+import http.server
+import json
+import math
+import mmap
+import multiprocessing
+import operator
+import os
+import pickle
+import random
 import re
-from copy import deepcopy
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from functools import lru_cache, partial
 from collections import defaultdict
+from collections.abc import Mapping
 from itertools import zip_longest
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class DeidentifiedContent(object):
     """
@@ -113,6 +136,324 @@ class DatasetRecord(dict):
         self.has_matched = False
 
 
+class DatasetRow(Mapping):
+    """
+    Dataset의 한 행을 DatasetRecord처럼 읽을 수 있게 하는 가벼운 뷰. 속성 값을 바꿀 수는 없다.
+    다중 값은 읽을 때마다 새 set으로 만들어 반환한다.
+    joined_from, joined_common_attributes, has_matched는 Dataset에 저장된다.
+    """
+    __slots__ = ('dataset', 'index')
+
+    def __init__(self, dataset, index):
+        """
+        :param dataset: Dataset.
+        :param index: int. 행 번호
+        """
+        self.dataset = dataset
+        self.index = index
+
+    def __getitem__(self, attribute_name):
+        return self.dataset.get_value(self.index, attribute_name)
+
+    def __contains__(self, attribute_name):
+        return self.dataset.has_value(self.index, attribute_name)
+
+    def __iter__(self):
+        return iter(self.dataset.row_attributes(self.index))
+
+    def __len__(self):
+        return len(self.dataset.row_attributes(self.index))
+
+    def __repr__(self):
+        return 'DatasetRow({!r})'.format(dict(self))
+
+    @property
+    def joined_from(self):
+        return self.dataset.joined_from.get(self.index, ())
+
+    @joined_from.setter
+    def joined_from(self, value):
+        self.dataset.joined_from[self.index] = value
+
+    @property
+    def joined_common_attributes(self):
+        # DatasetRecord처럼 반환된 set을 고치면 반영되도록 처음 읽을 때 Dataset에 저장한다
+        return self.dataset.joined_common_attributes.setdefault(self.index, set())
+
+    @joined_common_attributes.setter
+    def joined_common_attributes(self, value):
+        self.dataset.joined_common_attributes[self.index] = value
+
+    @property
+    def has_matched(self):
+        return bool(self.dataset.has_matched[self.index])
+
+    @has_matched.setter
+    def has_matched(self, value):
+        self.dataset.has_matched[self.index] = bool(value)
+
+
+class JoinedRecord(Mapping):
+    """
+    join()이 만드는 합친 레코드. 두 원본 레코드를 복사하지 않고 참조하며, merge()로 값이 바뀐 속성만 따로 가진다.
+    속성 값은 overrides, total_record, additional_record 순서로 찾는다.
+    원본 레코드나 읽은 다중 값(set)을 바꾸면 합친 레코드에도 보이므로 바꾸지 않아야 한다.
+    """
+    __slots__ = ('total_record', 'additional_record', 'overrides', 'joined_from', 'joined_common_attributes',
+                 'has_matched', 'score')
+
+    def __init__(self, total_record, additional_record, overrides=None, joined_common_attributes=None):
+        """
+        :param total_record: total_dataset의 레코드
+        :param additional_record: additional_dataset의 레코드
+        :param overrides: dict. 속성명 -> merge()로 바뀐 값
+        :param joined_common_attributes: set. 두 레코드의 공통 속성명
+        """
+        self.total_record = total_record
+        self.additional_record = additional_record
+        self.overrides = overrides if overrides is not None else {}
+        # (id(total_dataset), id(additional_dataset))
+        self.joined_from = ()
+        self.joined_common_attributes = joined_common_attributes if joined_common_attributes is not None else set()
+        self.has_matched = False
+        # ranked_join()이 매긴 점수. 그 밖에는 None
+        self.score = None
+
+    def __getitem__(self, attribute_name):
+        if attribute_name in self.overrides:
+            return self.overrides[attribute_name]
+        if attribute_name in self.total_record:
+            return self.total_record[attribute_name]
+        return self.additional_record[attribute_name]
+
+    def __setitem__(self, attribute_name, content):
+        # 원본 레코드는 그대로 두고 이 레코드에만 반영한다
+        self.overrides[attribute_name] = content
+
+    def __contains__(self, attribute_name):
+        return (attribute_name in self.overrides or attribute_name in self.total_record
+                or attribute_name in self.additional_record)
+
+    def __iter__(self):
+        yield from self.total_record
+        for attribute_name in self.additional_record:
+            if attribute_name not in self.total_record:
+                yield attribute_name
+        for attribute_name in self.overrides:
+            if attribute_name not in self.total_record and attribute_name not in self.additional_record:
+                yield attribute_name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return 'JoinedRecord({!r})'.format(dict(self))
+
+
+class DatasetColumn(object):
+    """
+    Dataset의 한 속성의 값들. 값이 있는 행마다의 values에 대한 오프셋으로 각 행의 값을 나타낸다.
+    """
+    __slots__ = ('offsets', 'multi', 'values')
+
+    def __init__(self):
+        # 이 속성을 가진 i번째 행의 값은 values[offsets[i]:offsets[i + 1]]
+        self.offsets = array('I', [0])
+        # 이 속성을 가진 i번째 행의 값이 다중 값(set)이면 1
+        self.multi = bytearray()
+        self.values = []
+
+
+class Dataset(object):
+    """
+    레코드들을 열 단위로 저장하는 데이터셋. DatasetRecord의 list 대신 join(), find(), print_data()에 사용할 수 있다.
+    속성명은 정수 ID로 바꿔 저장하고, 행마다 속성 ID의 순서(모양)를 공유하며,
+    다중 값은 오프셋과 값 배열로 저장한다. 행을 읽을 때는 DatasetRow 뷰를 만든다.
+    같은 값의 문자열과 MaskedContent는 하나의 객체를 공유한다.
+    메모리 사용량(tracemalloc, 값 객체 포함): bob_medical.csv의 행을 전화번호만 바꿔 10만 행으로 늘린 데이터에서
+    행당 약 180바이트(DatasetRecord의 list는 약 1,170바이트), facebook.db의 행을 url만 바꿔 10만 행으로 늘린 데이터에서
+    행당 약 180바이트(DatasetRecord의 list는 약 2,850바이트).
+    """
+    def __init__(self, records=()):
+        """
+        :param records: DatasetRecord 또는 dict의 iterable.
+        """
+        self.attribute_names = []
+        self.attribute_ids = {}
+        self.columns = []
+        self.shapes = []
+        # 모양마다 속성 ID -> 모양 안의 순서
+        self.shape_slots = []
+        self.shape_ids = {}
+        self.row_shapes = array('I')
+        # cell_positions[row_offsets[행 번호] + 모양 안의 순서]는 그 행의 값이 그 속성 컬럼의 몇 번째 값인지를 나타낸다.
+        # 값을 읽을 때 컬럼을 검색하지 않도록 추가할 때 기록한다.
+        self.row_offsets = array('I')
+        self.cell_positions = array('I')
+        self.has_matched = bytearray()
+        self.joined_common_attributes = {}
+        self.joined_from = {}
+        self._masked_contents = {}
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return len(self.row_shapes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [DatasetRow(self, row_index) for row_index in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return DatasetRow(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield DatasetRow(self, index)
+
+    def _attribute_id(self, attribute_name):
+        try:
+            return self.attribute_ids[attribute_name]
+        except KeyError:
+            attribute_id = len(self.attribute_names)
+            self.attribute_names.append(sys.intern(attribute_name))
+            self.attribute_ids[attribute_name] = attribute_id
+            self.columns.append(DatasetColumn())
+            return attribute_id
+
+    def _intern_value(self, value):
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, MaskedContent):
+            key = (value.content, tuple(value.valid), value.align)
+            return self._masked_contents.setdefault(key, value)
+        return value
+
+    def append(self, record):
+        """
+        레코드를 마지막 행으로 추가.
+        :param record: DatasetRecord 또는 dict.
+        :return: int. 추가된 행 번호
+        """
+        index = len(self)
+        shape = tuple(self._attribute_id(attribute_name) for attribute_name in record)
+        try:
+            shape_id = self.shape_ids[shape]
+        except KeyError:
+            shape_id = len(self.shapes)
+            self.shapes.append(tuple(self.attribute_names[attribute_id] for attribute_id in shape))
+            self.shape_slots.append({attribute_id: slot for slot, attribute_id in enumerate(shape)})
+            self.shape_ids[shape] = shape_id
+        self.row_shapes.append(shape_id)
+        self.row_offsets.append(len(self.cell_positions))
+
+        for attribute_id, content in zip(shape, record.values()):
+            column = self.columns[attribute_id]
+            self.cell_positions.append(len(column.multi))
+            if isinstance(content, (list, tuple, set)):
+                column.multi.append(1)
+                column.values.extend(self._intern_value(content_item) for content_item in content)
+            else:
+                column.multi.append(0)
+                column.values.append(self._intern_value(content))
+            column.offsets.append(len(column.values))
+
+        self.has_matched.append(bool(getattr(record, 'has_matched', False)))
+        if getattr(record, 'joined_common_attributes', None):
+            self.joined_common_attributes[index] = record.joined_common_attributes
+        if getattr(record, 'joined_from', None):
+            self.joined_from[index] = record.joined_from
+        return index
+
+    def extend(self, records):
+        """
+        레코드들을 행으로 추가.
+        :param records: DatasetRecord 또는 dict의 iterable.
+        """
+        for record in records:
+            self.append(record)
+
+    def row_attributes(self, index):
+        """
+        :param index: int. 행 번호
+        :return: 행이 가진 속성명의 tuple. 추가될 때의 순서를 따른다.
+        """
+        return self.shapes[self.row_shapes[index]]
+
+    def has_value(self, index, attribute_name):
+        """
+        :param index: int. 행 번호
+        :param attribute_name: 속성명
+        :return: bool. 행이 속성을 가지고 있는지의 여부
+        """
+        return self.attribute_ids.get(attribute_name) in self.shape_slots[self.row_shapes[index]]
+
+    def get_value(self, index, attribute_name):
+        """
+        :param index: int. 행 번호
+        :param attribute_name: 속성명
+        :return: 속성 값. 다중 값이면 새 set
+        """
+        attribute_id = self.attribute_ids.get(attribute_name)
+        slot = self.shape_slots[self.row_shapes[index]].get(attribute_id)
+        if slot is None:
+            raise KeyError(attribute_name)
+        column = self.columns[attribute_id]
+        position = self.cell_positions[self.row_offsets[index] + slot]
+        start, end = column.offsets[position], column.offsets[position + 1]
+        if column.multi[position]:
+            return set(column.values[start:end])
+        return column.values[start]
+
+    def record(self, index):
+        """
+        행을 DatasetRecord로 만듦.
+        :param index: int. 행 번호
+        :return: DatasetRecord.
+        """
+        row = self[index]
+        record = DatasetRecord(**row)
+        record.joined_from = row.joined_from
+        record.joined_common_attributes = set(row.joined_common_attributes)
+        record.has_matched = row.has_matched
+        return record
+
+
+class NormalizedEquality(object):
+    """
+    값을 정규화한 뒤 비교하는 문자열 비교 함수. equality_functions의 값으로 사용할 수 있다.
+    정규화는 값마다 한 번만 하며 그 결과를 LRU 캐시에 보관한다. 정규화한 값이 None이면 어떤 값과도 동등하지 않다.
+    """
+    def __init__(self, normalizer, comparator=None, maxsize=65536):
+        """
+        :param normalizer: function(string): 문자열을 정규화한 값을 반환하는 함수. 비교할 수 없는 값이면 None
+        :param comparator: function(normalized1, normalized2): 정규화된 두 값이 동등한지의 여부.
+            None이면 정규화된 값의 상등(==)으로 비교하며, 이 경우 정규화된 값으로 색인할 수 있다.
+        :param maxsize: int. 캐시에 보관할 정규화 결과의 최대 수
+        """
+        self.normalizer = normalizer
+        self.comparator = comparator
+        self.normalize = lru_cache(maxsize=maxsize)(normalizer)
+
+    @property
+    def exact(self):
+        """
+        :return: bool. 정규화된 값이 같을 때만 동등한지의 여부
+        """
+        return self.comparator is None
+
+    def __call__(self, string1, string2):
+        normalized1 = self.normalize(string1)
+        normalized2 = self.normalize(string2)
+        if normalized1 is None or normalized2 is None:
+            return False
+        if self.comparator is None:
+            return normalized1 == normalized2
+        return self.comparator(normalized1, normalized2)
+
+
 def mergeable(content1, content2, string_equivalence=None):
     """
     재귀함수. 두 내용이 동등하다고 볼 수 있어 하나로 합칠 수 있는지의 여부를 확인.
@@ -122,8 +463,7 @@ def mergeable(content1, content2, string_equivalence=None):
     :return: bool
     """
     if string_equivalence is None:
-        def string_equivalence(string1, string2):
-            return string1 == string2
+        string_equivalence = operator.eq
 
     if isinstance(content1, (str, bytes)) and isinstance(content2, (str, bytes)):
         # 문자열 vs 문자열
@@ -148,15 +488,14 @@ def mergeable(content1, content2, string_equivalence=None):
 
 def merge(content1, content2, string_equivalence=None):
     """
-    재귀함수. 동등한 두 내용을 합침.
+    재귀함수. 동등한 두 내용을 합침. 다중 값에서 합칠 수 있는 값이 여럿이면 _merge_order() 순서로 처음 값과 합친다.
     :param content1: 합칠 첫 번째 문자열
     :param content2: 합칠 두 번째 문자열
     :param string_equivalence: 문자열 대 문자열 비교시 사용할 일치 여부 함수. 기본값은 문자열 상등(==)이다.
     :return: 두 문자열의 정보를 합쳐 만들어진 문자열
     """
     if string_equivalence is None:
-        def string_equivalence(string1, string2):
-            return string1 == string2
+        string_equivalence = operator.eq
 
     if isinstance(content1, (str, bytes)) and isinstance(content2, (str, bytes)):
         # 문자열 vs 문자열
@@ -179,7 +518,7 @@ def merge(content1, content2, string_equivalence=None):
         # 다중 값 vs 단일 값
         result_set = set()
         content2_not_merged = True
-        for content1_item in content1:
+        for content1_item in sorted(content1, key=_merge_order):
             if content2_not_merged and mergeable(content1_item, content2, string_equivalence):
                 result_set.add(merge(content1_item, content2, string_equivalence))
                 content2_not_merged = False
@@ -192,7 +531,7 @@ def merge(content1, content2, string_equivalence=None):
         # 단일 값 vs 다중 값
         result_set = set()
         content1_not_merged = True
-        for content2_item in content2:
+        for content2_item in sorted(content2, key=_merge_order):
             if content1_not_merged and mergeable(content1, content2_item, string_equivalence):
                 result_set.add(merge(content1, content2_item, string_equivalence))
                 content1_not_merged = False
@@ -204,259 +543,2648 @@ def merge(content1, content2, string_equivalence=None):
     elif isinstance(content1, (list, tuple, set)) and isinstance(content2, (list, tuple, set)):
         # 다중 값 vs 다중 값
         result_set = set(content1)
-        for content2_item in content2:
-            # duplicate operation exists. may be enhanced.
-            result_set |= merge(result_set, content2_item, string_equivalence)
+        for content2_item in sorted(content2, key=_merge_order):
+            if isinstance(content2_item, (list, tuple, set)):
+                result_set |= merge(result_set, content2_item, string_equivalence)
+                continue
+            # result_set에서 처음으로 mergeable한 값과 합친 값을 추가한다. 없으면 그대로 추가한다
+            for result_item in sorted(result_set, key=_merge_order):
+                if mergeable(result_item, content2_item, string_equivalence):
+                    result_set.add(merge(result_item, content2_item, string_equivalence))
+                    break
+            else:
+                result_set.add(content2_item)
 
         return result_set
 
     raise TypeError()
 
 
-def join(total_dataset, additional_dataset, equality_functions=None):
+def _merge_order(content):
     """
-    total_dataset과 addtional_dataset을 조인한 데이터셋을 만든다.
-    :param equality_functions: equality_functions[attribute_name] = function(string1, string2): 두 문자열이 동등한지의 여부
-    :param total_dataset: DatasetRecord 객체의 리스트
-    :param additional_dataset: list of DatasetRecord obejct 객체의 리스트
-    :return: total_dataset과 additional_dataset을 조인해 만든 데이터셋
+    다중 값의 값들 중 여러 값과 합칠 수 있을 때 set의 순회 순서와 관계없이 같은 값과 합치도록 값들을 정렬하는 키.
+    Dataset이나 external_join()처럼 set을 다시 만들어도 결과가 같다.
     """
-    equality_functions = defaultdict(lambda: None, equality_functions)
-    result_set = []
-    # additional_dataset 레코드들 X total_dataset 레코드들
-    for additional_data_record in additional_dataset:
-        assert isinstance(additional_data_record, DatasetRecord)
-        matching_records = []
-        for total_data_record in total_dataset:
-            assert isinstance(total_data_record, DatasetRecord)
-
-            # addtional_dataset.레코드[i].속성들 X total_dataset.레코드[j].속성들
-            for attribute_name in additional_data_record:
-                if attribute_name in total_data_record:
-                    # addtional 쪽의 속성이 total 쪽에도 존재하는 경우
-                    if not mergeable(total_data_record[attribute_name],
-                                     additional_data_record[attribute_name], equality_functions[attribute_name]):
-                        break
-                else:
-                    # addtional 쪽의 속성이 total 쪽에도 존재하는 경우
-                    continue
-            else:
-                # 모든 속성이 mergeable -> 이 두 레코드는 조인 가능함
-                matching_records.append(total_data_record)
+    return isinstance(content, DeidentifiedContent), str(content)
 
-        # additional의 레코드와 totals의 레코드들을 조인
-        if matching_records:
-            print('*' + record_summary(additional_data_record, exclude_attribute=('url', '사진', '페이스북 커버 사진')))
-            for total_data_record in matching_records:
-                attribute_intersection = set()
-                assert isinstance(total_data_record, DatasetRecord)
-                joined_record = deepcopy(total_data_record)
-                assert isinstance(joined_record, DatasetRecord)
-                if joined_record.has_matched:
-                    joined_record.has_matched = False
-                for attribute_name, content in additional_data_record.items():
-                    if attribute_name in total_data_record:
-                        joined_record[attribute_name] = merge(total_data_record[attribute_name],
-                                                              additional_data_record[attribute_name],
-                                                              equality_functions[attribute_name])
-                        attribute_intersection.add(attribute_name)
-                        if isinstance(total_data_record[attribute_name], (str, DeidentifiedContent)):
-                            total_data_value = total_data_record[attribute_name]
-                        else:
-                            assert isinstance(total_data_record[attribute_name], set)
-                            total_data_value = ','.join(total_data_record[attribute_name])
 
-                        if isinstance(additional_data_record[attribute_name], (str, DeidentifiedContent)):
-                            additional_data_value = additional_data_record[attribute_name]
-                        else:
-                            assert isinstance(additional_data_record[attribute_name], set)
-                            additional_data_value = ','.join(additional_data_record[attribute_name])
-                    else:
-                        joined_record[attribute_name] = content
-                joined_record.joined_common_attributes = attribute_intersection
-                result_set.append(joined_record)
-                # 아우터 조인에 사용하기 위해 이미 매칭된 컬럼으로 표시
-                total_data_record.has_matched = True
-                joined_record.joined_from = (total_dataset, additional_dataset)
-                # 출력
-                summary = record_summary(total_data_record, exclude_attribute=('url', '사진', '페이스북 커버 사진'))
-                print('  {} -> {}'.format(str(joined_record.joined_common_attributes), summary))
-            print()
+def _plain_mergeable(content1, content2):
+    """
+    일반 문자열 또는 일반 문자열의 다중 값끼리 문자열 상등으로 비교하는 mergeable()
+    """
+    if isinstance(content1, str):
+        if isinstance(content2, str):
+            return content1 == content2
+        return content1 in content2
+    if isinstance(content2, str):
+        return content2 in content1
+    if not isinstance(content1, (set, frozenset)):
+        content1 = set(content1)
+    return not content1.isdisjoint(content2)
 
-            # 아우터 조인에 사용하기 위해 이미 매칭된 컬럼으로 표시
-            additional_data_record.has_matched = True
 
-    # 조인되지 않은 레코드
-    for additional_data_record in additional_dataset:
-        assert isinstance(additional_data_record, DatasetRecord)
-        if not additional_data_record.has_matched:
-            result_set.append(additional_data_record)
-        else:
-            additional_data_record.has_matched = False
+def _plain_merge(content1, content2):
+    """
+    일반 문자열 또는 일반 문자열의 다중 값끼리 문자열 상등으로 합치는 merge()
+    """
+    if isinstance(content1, str):
+        if isinstance(content2, str):
+            return content1 if content1 == content2 else {content1, content2}
+        result_set = set(content2)
+        result_set.add(content1)
+        return result_set
+    result_set = set(content1)
+    if isinstance(content2, str):
+        result_set.add(content2)
+    else:
+        result_set.update(content2)
+    return result_set
 
-    for total_data_record in total_dataset:
-        assert isinstance(total_data_record, DatasetRecord)
-        if not total_data_record.has_matched:
-            result_set.append(total_data_record)
-        else:
-            total_data_record.has_matched = False
 
-    return result_set
+def _masked_mergeable(content1, content2):
+    """
+    MaskedContent와 일반 문자열 또는 일반 문자열의 다중 값을 비교하는 mergeable()
+    """
+    if isinstance(content2, str):
+        return content1.mergeable(content2)
+    return any(content1.mergeable(content2_item) for content2_item in content2)
 
 
-def get_dataset_from_sqlite_narrecord_table(file_name, table_name, id_attribute='id', key_attribute='key',
-                                            value_attribute='value'):
+def _masked_merge(content1, content2):
     """
-    narrow table 형태로 되어 있는 sqlite 테이블을 불러옴.
-    :param file_name: sqlite 데이터베이스 파일 이름
-    :param table_name: 불러올 테이블 이름
-    :param id_attribute: ID로 사용되는 컬럼명
-    :param key_attribute: 속성명으로 사용되는 컬럼명명
-    :param value_attribute: 속성 값으로 사용되는 컬럼명
-    :return: DatasetRecord의 list형태로 되어 있는 데이터셋.
+    MaskedContent와 mergeable한 일반 문자열 또는 일반 문자열의 다중 값을 합치는 merge()
     """
-    cursor = sqlite3.connect(file_name).cursor()
-    cursor.execute(
-        'SELECT {id}, {key}, {value} FROM {table}'.format(id=id_attribute, key=key_attribute, value=value_attribute,
-                                                          table=table_name))
-    data_set = defaultdict(DatasetRecord)
-    for record_id, key, value in cursor.fetchall():
-        try:
-            data_set[record_id][key].add(value)
-        except KeyError:
-            data_set[record_id][key] = {value}
+    if isinstance(content2, str):
+        return content2
+    result_set = set(content2)
+    if not any(content1.mergeable(content2_item) for content2_item in content2):
+        result_set.add(content1)
+    return result_set
 
-    return list(data_set.values())
+
+def column_kind(content):
+    """
+    :return: 값의 종류. 'plain'(일반 문자열 또는 일반 문자열의 다중 값), 'masked'(MaskedContent) 또는 'generic'
+    """
+    if isinstance(content, str):
+        return 'plain'
+    elif isinstance(content, MaskedContent):
+        return 'masked'
+    elif isinstance(content, (list, tuple, set)) and all(isinstance(content_item, str) for content_item in content):
+        return 'plain'
+    return 'generic'
 
 
-def get_dataset_from_csv(file_name):
+def column_kinds(data_set):
     """
-    csv 파일로부터 데이터를 불러옴.
-    :param file_name: csv 파일 이름
-    :return: DatasetRecord의 list형태로 되어 있는 데이터셋.
+    :param data_set: 레코드의 iterable
+    :return: dict. 속성명 -> 그 속성의 모든 값이 같은 종류이면 column_kind(), 아니면 'generic'
     """
-    data_set = []
-    with open(file_name, encoding='utf-8') as f:
-        for record in csv.DictReader(f):
-            data_set.append(DatasetRecord(**record))
-    return data_set
+    kinds = {}
+    for record in data_set:
+        for attribute_name, content in record.items():
+            kind = kinds.get(attribute_name)
+            if kind == 'generic':
+                continue
+            content_kind = column_kind(content)
+            kinds[attribute_name] = content_kind if kind is None or kind == content_kind else 'generic'
+    return kinds
 
 
-def find(data_set, query_dict):
+class ColumnComparators(dict):
     """
-    data_set에서 query_dict와 조인 가능한 레코드를 반환
-    :param data_set: DataRecord의 list.
-    :param query_dict: dict.
-    :return: DataRecord의 list. 조인 가능한 모든 레코드의 리스트
+    속성명 -> (mergeable 함수, merge 함수). 함수들은 (total_dataset 쪽 값, additional_dataset 쪽 값)을 받는다.
+    양쪽 속성 값의 종류에 맞는 함수를 조인 전에 한 번 골라 두어 mergeable(), merge()의 타입 분기와 재귀를 건너뛴다.
+    - 양쪽이 모두 'plain'이고 비교 함수가 없으면 set의 해시 연산(in, isdisjoint, union)으로 비교하고 합친다.
+    - total 쪽이 'masked', additional 쪽이 'plain'이면 MaskedContent.mergeable()을 바로 호출한다.
+    - 그 밖의 속성과 종류를 모르는 속성은 비교 함수를 준 mergeable(), merge()를 사용한다.
+    결과는 mergeable(), merge()와 같다. attribute_order는 레코드 쌍을 비교할 속성의 순서이다.
     """
-    result_set = []
-    for data_record in data_set:
-        for attribute_name, value in query_dict.items():
-            if attribute_name not in data_record:
-                break
+    def __init__(self, equality_functions=None, total_kinds=None, additional_kinds=None, attribute_order=None):
+        """
+        :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+        :param total_kinds: dict. total_dataset의 column_kinds()
+        :param additional_kinds: dict. additional_dataset의 column_kinds()
+        :param attribute_order: 먼저 비교할 속성명들의 순서. None이면 additional_dataset 레코드의 속성 순서로 비교한다.
+        """
+        super().__init__()
+        self.equality_functions = equality_functions or {}
+        self.attribute_order = tuple(attribute_order) if attribute_order is not None else None
+        self._attribute_order_set = frozenset(self.attribute_order or ())
+        total_kinds = total_kinds or {}
+        additional_kinds = additional_kinds or {}
+        for attribute_name, total_kind in total_kinds.items():
+            additional_kind = additional_kinds.get(attribute_name)
+            if additional_kind != 'plain':
+                continue
+            if total_kind == 'plain' and self.equality_functions.get(attribute_name) is None:
+                self[attribute_name] = (_plain_mergeable, _plain_merge)
+            elif total_kind == 'masked':
+                self[attribute_name] = (_masked_mergeable, _masked_merge)
 
-            if not mergeable(data_record[attribute_name], value):
-                break
-        else:
-            result_set.append(data_record)
-    result_set.sort(reverse=True,
-                    key=lambda x: len(x.joined_common_attributes))
-    return result_set
+    def ordered(self, record):
+        """
+        :return: 레코드의 속성명들을 attribute_order의 순서로 정렬한 list. attribute_order에 없는 속성은 뒤에 둔다.
+        """
+        if self.attribute_order is None:
+            return list(record)
+        return ([attribute_name for attribute_name in self.attribute_order if attribute_name in record]
+                + [attribute_name for attribute_name in record if attribute_name not in self._attribute_order_set])
 
+    def __missing__(self, attribute_name):
+        string_equivalence = self.equality_functions.get(attribute_name)
+        comparator = (partial(mergeable, string_equivalence=string_equivalence),
+                      partial(merge, string_equivalence=string_equivalence))
+        self[attribute_name] = comparator
+        return comparator
 
-def collapsed_string(original_string, max_length=15, front_leaving=7, end_leaving=7):
+
+def visible_key(content):
     """
-    너무 긴 문자열을 ...으로 줄임.
-    :param original_string: 원본 문자열
-    :param max_length: 문자열을 줄이지 않는 최대 길이
-    :param front_leaving: ...의 앞에 남길 길이
-    :param end_leaving: ...의 뒤에 남길 길이
-    :return:
+    마스킹 처리된 내용에서 마스킹되지 않고 보이는 문자들의 위치와 문자를 구함.
+    :param content: MaskedContent.
+    :return: (보이는 위치의 tuple, 보이는 문자의 tuple). 색인할 수 없는 내용이면 None
     """
-    if len(original_string) <= max_length:
-        return original_string
-    return ''.join((original_string[:front_leaving], '...', original_string[front_leaving:][-end_leaving:]))
+    if not isinstance(content, MaskedContent) or content.align != 'left' or len(content.valid) != len(content.content):
+        return None
+    positions = tuple(index for index, valid in enumerate(content.valid) if valid)
+    return positions, tuple(content.content[index] for index in positions)
 
 
-def record_summary(record, exclude_attribute=()):
-    exclude_attribute = set(exclude_attribute)
-    summary = []
-    for attribute_name, attribute_value in record.items():
-        if attribute_name in exclude_attribute:
-            continue
-
-        attribute = attribute_name + ': '
-        if isinstance(attribute_value, set):
-            if len(attribute_value) == 1:
-                attribute += collapsed_string(str(next(iter(attribute_value))))
-            else:
-                attribute += '{' + ','.join(collapsed_string(item) for item in attribute_value) + '}'
+class AttributeIndex(object):
+    """
+    한 속성의 값들에 대한 역색인. 어떤 값과 mergeable할 수 있는 레코드 위치의 후보를 찾는 데 사용한다.
+    후보는 실제로 mergeable한 레코드를 모두 포함하며, 최종 판단은 mergeable()로 해야 한다.
+    """
+    def __init__(self, string_equivalence=None, positional=False):
+        """
+        :param string_equivalence: 문자열 대 문자열 비교시 사용할 일치 여부 함수.
+            None이거나 exact인 NormalizedEquality가 아니면 일반 문자열 값은 색인할 수 없다.
+        :param positional: bool. True이면 일반 문자열 값의 (위치, 문자)도 색인하여 MaskedContent로도 후보를 찾을 수 있다.
+        """
+        self.string_equivalence = string_equivalence
+        # 일반 문자열 값을 색인 키로 바꾸는 함수. 색인할 수 없으면 None
+        if string_equivalence is None:
+            self.exact_key = None
+        elif isinstance(string_equivalence, NormalizedEquality) and string_equivalence.exact:
+            self.exact_key = string_equivalence.normalize
         else:
-            attribute += collapsed_string(str(attribute_value))
-        summary.append(attribute)
+            self.exact_key = False
+        # 일반 문자열 값(의 색인 키) -> 레코드 위치들
+        self.exact = defaultdict(set)
+        # 마스킹 패턴(보이는 위치들) -> 보이는 문자들 -> 레코드 위치들
+        self.masked = defaultdict(lambda: defaultdict(set))
+        # (위치, 문자) -> 그 위치에 그 문자가 있는 일반 문자열 값을 가진 레코드 위치들
+        self.positional = defaultdict(set) if positional else None
+        # MaskedContent 값을 가진 레코드 위치들
+        self.masked_positions = set()
+        # 색인할 수 없는 값을 가진 레코드 위치들. 항상 후보가 된다.
+        self.unindexed = set()
+        # 이 속성을 가진 레코드 위치들
+        self.present = set()
 
-    return ', '.join(summary)
+    def add(self, position, content):
+        """
+        레코드 위치 position의 속성 값 content를 색인에 추가.
+        :param position: int. 레코드 위치
+        :param content: 속성 값
+        """
+        self.present.add(position)
+        if isinstance(content, (list, tuple, set)):
+            for content_item in content:
+                if not self._add_single(position, content_item):
+                    self.unindexed.add(position)
+        elif not self._add_single(position, content):
+            self.unindexed.add(position)
 
+    def _add_single(self, position, content):
+        if isinstance(content, str):
+            if self.positional is not None:
+                for char_position, char in enumerate(content):
+                    self.positional[char_position, char].add(position)
+            if self.exact_key is False:
+                return False
+            key = self.exact_key(content) if self.exact_key else content
+            # 정규화한 값이 None이면 어떤 값과도 같지 않으므로 색인하지 않는다
+            if key is not None:
+                self.exact[key].add(position)
+            return True
+        key = visible_key(content)
+        if key is None:
+            return False
+        positions, chars = key
+        self.masked[positions][chars].add(position)
+        self.masked_positions.add(position)
+        return True
 
-def print_data(list_of_dict):
-    for index, record in enumerate(list_of_dict, start=1):
-        assert isinstance(record, DatasetRecord)
-        print('#{}'.format(index))
-        for key, values in record.items():
-            print('{}: {}'.format(key, values))
-        print('공통 컬럼: {}'.format(record.joined_common_attributes))
-        print()
+    def probe(self, content):
+        """
+        content와 mergeable할 수 있는 레코드 위치의 후보를 구함. 이 속성을 갖지 않은 레코드는 포함하지 않는다.
+        :param content: 비교할 속성 값
+        :return: 레코드 위치의 set. 후보를 좁힐 수 없으면 None
+        """
+        if isinstance(content, (list, tuple, set)):
+            candidates = set()
+            for content_item in content:
+                item_candidates = self._probe_single(content_item)
+                if item_candidates is None:
+                    return None
+                candidates |= item_candidates
+        else:
+            candidates = self._probe_single(content)
+            if candidates is None:
+                return None
+        return candidates | self.unindexed
 
+    def _probe_single(self, content):
+        if isinstance(content, MaskedContent):
+            return self._probe_masked(content)
+        if not isinstance(content, str):
+            return None
+        candidates = set()
+        if self.exact_key is not False:
+            key = self.exact_key(content) if self.exact_key else content
+            if key in self.exact:
+                candidates |= self.exact[key]
+        for positions, chars_index in self.masked.items():
+            if positions and len(content) <= positions[-1]:
+                continue
+            matched = chars_index.get(tuple(content[index] for index in positions))
+            if matched:
+                candidates |= matched
+        return candidates
 
-def main():
-    # cross
-    sensitive_medical_table = get_dataset_from_csv('bob_medical.csv')
-    for record in sensitive_medical_table:
-        record['이름'] = MaskedContent(record['이름'], align='left')
-        record['전화번호'] = MaskedContent(record['전화번호'], align='left')
-        record['생년월일'] = MaskedContent(record['생년월일'], align='left')
-        if record['학교'] == '검정고시':
-            del record['학교']
+    def _probe_masked(self, content):
+        key = visible_key(content)
+        if self.positional is None or key is None or not key[0]:
+            return None
+        # 보이는 문자마다 그 위치에 그 문자가 있는 레코드들의 교집합. 작은 것부터 구한다.
+        postings = sorted((self.positional.get(char_position_char, set()) for char_position_char in zip(*key)),
+                          key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        # MaskedContent끼리는 양쪽 모두 보이는 위치만 비교하므로 항상 후보가 된다
+        return candidates | self.masked_positions
 
-    facebook_data = get_dataset_from_sqlite_narrecord_table('facebook.db', 'fb', 'url', 'key', 'value')
-    for record in facebook_data:
-        if '휴대폰' in record:
-            try:
-                record['전화번호'] |= record.pop('휴대폰')
-            except KeyError:
-                record['전화번호'] = set(record.pop('휴대폰'))
-        if '기타 전화번호' in record:
-            try:
-                record['전화번호'] |= record.pop('기타 전화번호')
-            except KeyError:
-                record['전화번호'] = set(record.pop('기타 전화번호'))
-        if '학력' in record:
+
+class BlockingIndex(object):
+    """
+    데이터셋의 레코드들에 대한 블로킹 색인.
+    조인시 모든 레코드 쌍을 비교하지 않고, 마스킹되지 않은 문자와 일반 문자열 값이 맞는 후보 레코드만 비교하게 한다.
+    """
+    def __init__(self, data_set=(), equality_functions=None, positional=False):
+        """
+        :param data_set: 색인할 DatasetRecord의 list.
+        :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+        :param positional: bool. True이면 MaskedContent 값으로도 후보를 좁힐 수 있게 (위치, 문자)도 색인한다.
+        """
+        self.equality_functions = dict(equality_functions or {})
+        self.positional = positional
+        self.records = []
+        self.attribute_indexes = {}
+        self._missing = {}
+        for record in data_set:
+            self.add(record)
+
+    def add(self, record):
+        """
+        레코드를 색인에 추가.
+        :param record: DatasetRecord.
+        :return: int. 추가된 레코드의 위치
+        """
+        position = len(self.records)
+        self.records.append(record)
+        for attribute_name, content in record.items():
             try:
-                record['학교'] |= record.pop('학력')
+                attribute_index = self.attribute_indexes[attribute_name]
             except KeyError:
-                record['학교'] = set(record.pop('학력'))
+                attribute_index = AttributeIndex(self.equality_functions.get(attribute_name), self.positional)
+                self.attribute_indexes[attribute_name] = attribute_index
+            attribute_index.add(position, content)
+        for attribute_name, missing in self._missing.items():
+            if attribute_name not in record:
+                missing.add(position)
+        return position
 
-    equility_functions = dict()
+    def _missing_positions(self, attribute_name):
+        try:
+            return self._missing[attribute_name]
+        except KeyError:
+            present = self.attribute_indexes[attribute_name].present
+            missing = set(range(len(self.records))) - present
+            self._missing[attribute_name] = missing
+            return missing
 
-    def gender_equal(value1, value2):
-        if value1 in ('F', '여성') and value2 in ('F', '여성'):
-            return True
-        if value1 in ('M', '남성') and value2 in ('M', '남성'):
-            return True
-        return False
+    def candidates(self, record):
+        """
+        record와 조인 가능할 수 있는 레코드 위치들을 구함.
+        record와 공통 속성이 없는 레코드는 항상 조인 가능하므로 후보에 포함된다.
+        :param record: DatasetRecord 또는 dict.
+        :return: 레코드 위치의 오름차순 list
+        """
+        probes = []
+        for attribute_name, content in record.items():
+            attribute_index = self.attribute_indexes.get(attribute_name)
+            if attribute_index is None:
+                continue
+            probed = attribute_index.probe(content)
+            if probed is not None:
+                probes.append((attribute_name, attribute_index, probed))
+        if not probes:
+            return list(range(len(self.records)))
 
-    def school_equal(school1, school2):
-        school1_stripped = ''.join(re.findall(r'[a-zA-Z0-9ㄱ-ㅎㅏ-ㅣ가-힣]+', school1.lower()))
-        school2_stripped = ''.join(re.findall(r'[a-zA-Z0-9ㄱ-ㅎㅏ-ㅣ가-힣]+', school2.lower()))
-        return school1_stripped in school2_stripped or school2_stripped in school1_stripped
+        # 이 속성을 갖지 않은 레코드도 후보이므로 (후보 + 속성이 없는 레코드)가 가장 작은 속성부터 교집합을 구한다
+        probes.sort(key=lambda probe: len(probe[2]) + len(self.records) - len(probe[1].present))
+        attribute_name, attribute_index, candidates = probes[0]
+        if len(attribute_index.present) < len(self.records):
+            candidates = candidates | self._missing_positions(attribute_name)
+        for attribute_name, attribute_index, probed in probes[1:]:
+            if not candidates:
+                break
+            candidates = (candidates & probed) | (candidates - attribute_index.present)
+        return sorted(candidates)
 
-    equility_functions['성별'] = gender_equal
-    equility_functions['학교'] = school_equal
+    def candidate_records(self, record):
+        """
+        record와 조인 가능할 수 있는 레코드들을 원래 순서대로 구함.
+        :param record: DatasetRecord 또는 dict.
+        :return: DatasetRecord의 list
+        """
+        return [self.records[position] for position in self.candidates(record)]
 
-    total_data = join(sensitive_medical_table, facebook_data, equility_functions)
-    # print_data(total_data)
 
-    # search
+class MaskedColumn(object):
+    """
+    일반 문자열과 왼쪽 정렬된 MaskedContent, 또는 그것들의 다중 값으로만 이루어진 컬럼.
+    각 값을 고정 폭의 코드 포인트 배열과 비교 대상 여부(MaskedContent.valid) 배열로 인코딩하여
+    한 값과 컬럼 전체, 또는 컬럼과 컬럼을 한 번의 NumPy 연산으로 비교한다. 다중 값은 항목마다 한 줄로 인코딩하고
+    항목 중 하나라도 맞으면 맞는 것으로 모은다. numpy가 필요하다.
+    """
+    def __init__(self, contents):
+        """
+        :param contents: 일반 문자열, 왼쪽 정렬된 MaskedContent, 그것들의 list, tuple, set 또는 None(속성이 없음)의 list.
+        """
+        if numpy is None:
+            raise ImportError('MaskedColumn requires numpy')
+        self.contents = list(contents)
+        # 인코딩한 항목들과 각 항목이 속한 행
+        self.items = []
+        owners = []
+        texts = []
+        masks = []
+        for index, content in enumerate(self.contents):
+            if content is None:
+                continue
+            for content_item in content if isinstance(content, (list, tuple, set)) else (content,):
+                if isinstance(content_item, str):
+                    texts.append(content_item)
+                    masks.append(None)
+                elif visible_key(content_item) is not None:
+                    texts.append(content_item.content)
+                    masks.append(content_item.valid)
+                else:
+                    raise TypeError('unsupported content: {!r}'.format(content_item))
+                self.items.append(content_item)
+                owners.append(index)
+        size = len(texts)
+        self.owners = numpy.array(owners, dtype=numpy.int64)
+        # 모든 행이 항목 하나씩이면 항목의 결과가 곧 행의 결과이다
+        self.single_valued = numpy.array_equal(self.owners, numpy.arange(len(self.contents)))
+        self.width = max([len(text) for text in texts] + [1])
+        self.present = numpy.array([content is not None for content in self.contents], dtype=bool)
+        self.masked = numpy.array([mask is not None for mask in masks], dtype=bool)
+        lengths = numpy.array([len(text) for text in texts], dtype=numpy.int64)
+        codes = numpy.array(texts, dtype='<U{}'.format(self.width)).view(numpy.int32)
+        self.codes = codes.reshape(size, self.width).astype(numpy.int32)
+        # 문자열 길이 밖은 어떤 문자와도 같지 않은 -1로 채운다
+        self.codes[numpy.arange(self.width) >= lengths[:, None]] = -1
+        # 일반 문자열은 모든 위치를, MaskedContent는 마스킹되지 않은 위치만 비교한다
+        self.care = numpy.ones((size, self.width), dtype=bool)
+        for index, mask in enumerate(masks):
+            if mask is not None:
+                self.care[index] = False
+                self.care[index, :len(mask)] = mask
+        # NormalizedEquality -> (정규화된 값 -> 번호, 일반 문자열 항목마다 정규화된 값의 번호)
+        self._normalized = {}
+
+    @classmethod
+    def from_dataset(cls, data_set, attribute_name):
+        """
+        데이터셋의 한 속성으로 컬럼을 만듦.
+        :param data_set: DatasetRecord의 list.
+        :param attribute_name: 속성명
+        :return: MaskedColumn. 일반 문자열과 왼쪽 정렬된 MaskedContent, 그것들의 다중 값 외의 값이 있으면 None
+        """
+        contents = []
+        for record in data_set:
+            content = record.get(attribute_name)
+            if content is not None:
+                for content_item in content if isinstance(content, (list, tuple, set)) else (content,):
+                    if not isinstance(content_item, str) and visible_key(content_item) is None:
+                        return None
+            contents.append(content)
+        return cls(contents)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def _by_record(self, item_result):
+        # 항목마다의 결과를 행마다의 결과로 모은다
+        if self.single_valued:
+            return item_result
+        result = numpy.zeros((len(self.contents),) + item_result.shape[1:], dtype=bool)
+        numpy.logical_or.at(result, self.owners, item_result)
+        return result
+
+    def _encode(self, content):
+        if isinstance(content, str):
+            text, valid = content, None
+        elif visible_key(content) is not None:
+            text, valid = content.content, content.valid
+        else:
+            return None
+        codes = numpy.full(self.width, -1, dtype=numpy.int32)
+        codes[:min(len(text), self.width)] = [ord(char) for char in text[:self.width]]
+        if valid is None:
+            care = numpy.ones(self.width, dtype=bool)
+            overflow = len(text) > self.width
+        else:
+            care = numpy.zeros(self.width, dtype=bool)
+            care[:min(len(valid), self.width)] = valid[:self.width]
+            overflow = any(valid[self.width:])
+        return codes, care, overflow
+
+    def _plain_equal(self, content, string_equivalence):
+        # 일반 문자열 항목마다 string_equivalence(항목, content)의 결과. exact인 NormalizedEquality만 사용한다.
+        # 정규화된 값을 번호로 바꿔 두고 번호끼리 비교하며, 정규화한 값이 None이면 어떤 값과도 같지 않으므로
+        # None은 번호를 매기지 않는다
+        if string_equivalence not in self._normalized:
+            numbers = {None: -2}
+            self._normalized[string_equivalence] = numbers, numpy.array(
+                [numbers.setdefault(string_equivalence.normalize(self.items[index]), len(numbers) - 1)
+                 for index in numpy.flatnonzero(~self.masked)], dtype=numpy.int64)
+        numbers, normalized = self._normalized[string_equivalence]
+        key = string_equivalence.normalize(content)
+        return normalized == (numbers.get(key, -1) if key is not None else -1)
+
+    def match(self, content, string_equivalence=None):
+        """
+        content와 mergeable한 값을 가진 행을 구함.
+        :param content: 일반 문자열, 왼쪽 정렬된 MaskedContent 또는 그것들의 list, tuple, set.
+        :param string_equivalence: 문자열 대 문자열 비교시 사용할 일치 여부 함수. 기본값은 문자열 상등(==)이다.
+        :return: 행마다 mergeable 여부를 나타내는 bool 배열. 비교할 수 없는 content이거나, 일반 문자열 content를
+            exact인 NormalizedEquality가 아닌 비교 함수로 비교해야 하면 None
+        """
+        if isinstance(content, (list, tuple, set)):
+            result = numpy.zeros(len(self.contents), dtype=bool)
+            for content_item in content:
+                item_result = self.match(content_item, string_equivalence)
+                if item_result is None:
+                    return None
+                result |= item_result
+            return result
+
+        exact = isinstance(string_equivalence, NormalizedEquality) and string_equivalence.exact
+        if string_equivalence is not None and not exact and isinstance(content, str):
+            # 컬럼 전체에 비교 함수를 부르는 것은 하나씩 비교하는 것보다 느리므로 거르지 않는다
+            return None
+        encoded = self._encode(content)
+        if encoded is None:
+            return None
+        codes, care, overflow = encoded
+        result = ((self.codes == codes) | ~self.care | ~care).all(axis=1)
+        if overflow:
+            # 컬럼보다 긴 위치까지 비교해야 하면 MaskedContent인 항목만 일치할 수 있다
+            result &= self.masked
+        if string_equivalence is not None and isinstance(content, str):
+            # 일반 문자열끼리는 사용자 정의 비교 함수를 따른다
+            result[~self.masked] = self._plain_equal(content, string_equivalence)
+        return self._by_record(result)
+
+    def match_column(self, other):
+        """
+        두 컬럼의 모든 행 쌍에 대해 mergeable 여부를 구함. 일반 문자열끼리는 문자열 상등으로 비교한다.
+        :param other: MaskedColumn.
+        :return: (len(self), len(other)) 모양의 bool 배열
+        """
+        width = max(self.width, other.width)
+        codes1, care1 = self._widened(width)
+        codes2, care2 = other._widened(width)
+        result = ((codes1[:, None, :] == codes2[None, :, :]) | ~care1[:, None, :] | ~care2[None, :, :]).all(axis=2)
+        return self._by_record(other._by_record(result.T).T)
+
+    def _widened(self, width):
+        codes = numpy.full((len(self.items), width), -1, dtype=numpy.int32)
+        codes[:, :self.width] = self.codes
+        care = numpy.zeros((len(self.items), width), dtype=bool)
+        care[:, :self.width] = self.care
+        # 일반 문자열은 늘어난 위치도 비교한다
+        care[~self.masked, self.width:] = True
+        return codes, care
+
+
+class VectorizedIndex(object):
+    """
+    데이터셋의 속성들을 MaskedColumn으로 인코딩해 두고, 레코드와 조인 가능할 수 있는 후보를 한 번에 구하는 색인.
+    MaskedColumn으로 만들 수 없는 속성은 후보를 좁히는 데 사용하지 않는다.
+    """
+    def __init__(self, data_set, equality_functions=None):
+        """
+        :param data_set: 색인할 DatasetRecord의 list.
+        :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+        """
+        if numpy is None:
+            raise ImportError('VectorizedIndex requires numpy')
+        self.equality_functions = dict(equality_functions or {})
+        self.records = list(data_set)
+        attribute_names = []
+        for record in self.records:
+            for attribute_name in record:
+                if attribute_name not in attribute_names:
+                    attribute_names.append(attribute_name)
+        self.columns = {}
+        for attribute_name in attribute_names:
+            column = MaskedColumn.from_dataset(self.records, attribute_name)
+            if column is not None:
+                self.columns[attribute_name] = column
+
+    def candidates(self, record):
+        """
+        record와 조인 가능할 수 있는 레코드 위치들을 구함.
+        :param record: DatasetRecord 또는 dict.
+        :return: 레코드 위치의 오름차순 list
+        """
+        result = numpy.ones(len(self.records), dtype=bool)
+        for attribute_name, content in record.items():
+            column = self.columns.get(attribute_name)
+            if column is None:
+                continue
+            matched = column.match(content, self.equality_functions.get(attribute_name))
+            if matched is not None:
+                # 속성이 없는 레코드는 그 속성을 비교하지 않으므로 후보로 남는다
+                result &= matched | ~column.present
+        return numpy.flatnonzero(result).tolist()
+
+    def query_candidates(self, query_dict):
+        """
+        query_dict와 조인 가능할 수 있는 레코드 위치들을 구함. find()와 같이 질의한 속성이 없는 레코드는 제외한다.
+        :param query_dict: dict.
+        :return: 레코드 위치의 오름차순 list
+        """
+        result = numpy.ones(len(self.records), dtype=bool)
+        for attribute_name, value in query_dict.items():
+            column = self.columns.get(attribute_name)
+            if column is None:
+                continue
+            matched = column.match(value, self.equality_functions.get(attribute_name))
+            if matched is not None:
+                result &= matched
+        return numpy.flatnonzero(result).tolist()
+
+    def candidate_records(self, record):
+        """
+        record와 조인 가능할 수 있는 레코드들을 원래 순서대로 구함.
+        :param record: DatasetRecord 또는 dict.
+        :return: DatasetRecord의 list
+        """
+        return [self.records[position] for position in self.candidates(record)]
+
+    def find(self, query_dict, k=None):
+        """
+        query_dict와 조인 가능한 레코드를 공통 컬럼이 많은 순서로 반환. 결과는 find()와 같다.
+        컬럼은 색인을 만들 때 한 번만 인코딩하므로 같은 데이터셋에 여러 번 검색할 때 사용한다.
+        :param query_dict: dict.
+        :param k: int. 반환할 최대 레코드 수. None이면 모두 반환한다.
+        :return: DataRecord의 list.
+        """
+        matched_records = (self.records[position] for position in self.query_candidates(query_dict)
+                           if _record_matches_query(self.records[position], query_dict, self.equality_functions))
+        if k is None:
+            return sorted(matched_records, reverse=True, key=lambda x: len(x.joined_common_attributes))
+        return heapq.nlargest(k, matched_records, key=lambda x: len(x.joined_common_attributes))
+
+
+class JoinStats(object):
+    """
+    join()의 계측 결과. join(stats=JoinStats())로 넘기면 조인하면서 값을 채운다.
+    """
+    def __init__(self):
+        # 색인으로 후보에서 제외되어 비교하지 않은 레코드 쌍의 수
+        self.pairs_skipped = 0
+        # mergeable()로 비교한 레코드 쌍의 수
+        self.pairs_considered = 0
+        # 속성명 -> 그 속성이 mergeable하지 않아 제외된 레코드 쌍의 수
+        self.pairs_pruned = defaultdict(int)
+        # 조인된 레코드 쌍의 수
+        self.pairs_matched = 0
+        # 속성명 -> 그 속성의 mergeable() 비교(equality_functions 호출 포함)에 걸린 시간(초)
+        self.equality_seconds = defaultdict(float)
+        # merge()에 걸린 시간(초)
+        self.merge_seconds = 0.0
+        # 합친 레코드(JoinedRecord)를 만드는 데 걸린 시간(초)
+        self.copy_seconds = 0.0
+        # join() 전체에 걸린 시간(초)
+        self.elapsed_seconds = 0.0
+
+    def update(self, other):
+        """
+        다른 JoinStats의 값을 더함.
+        :param other: JoinStats.
+        """
+        self.pairs_skipped += other.pairs_skipped
+        self.pairs_considered += other.pairs_considered
+        for attribute_name, count in other.pairs_pruned.items():
+            self.pairs_pruned[attribute_name] += count
+        self.pairs_matched += other.pairs_matched
+        for attribute_name, seconds in other.equality_seconds.items():
+            self.equality_seconds[attribute_name] += seconds
+        self.merge_seconds += other.merge_seconds
+        self.copy_seconds += other.copy_seconds
+
+    def __str__(self):
+        lines = ['pairs skipped: {}'.format(self.pairs_skipped),
+                 'pairs considered: {}'.format(self.pairs_considered),
+                 'pairs matched: {}'.format(self.pairs_matched)]
+        for attribute_name, count in sorted(self.pairs_pruned.items(), key=lambda item: -item[1]):
+            lines.append('  pruned by {}: {}'.format(attribute_name, count))
+        for attribute_name, seconds in sorted(self.equality_seconds.items(), key=lambda item: -item[1]):
+            lines.append('  equality {}: {:.6f}s'.format(attribute_name, seconds))
+        lines.append('merge: {:.6f}s'.format(self.merge_seconds))
+        lines.append('copy: {:.6f}s'.format(self.copy_seconds))
+        lines.append('elapsed: {:.6f}s'.format(self.elapsed_seconds))
+        return '\n'.join(lines)
+
+
+def join_record(total_data_record, additional_data_record, comparators, stats=None):
+    """
+    조인 가능한 두 레코드를 합친 레코드를 만든다.
+    :param total_data_record: total_dataset의 레코드
+    :param additional_data_record: additional_dataset의 레코드
+    :param comparators: ColumnComparators 또는 equality_functions
+    :param stats: JoinStats. 주어지면 합친 레코드를 만들고 merge()하는 데 걸린 시간을 더한다.
+    :return: JoinedRecord. joined_from은 설정하지 않는다.
+    """
+    if not isinstance(comparators, ColumnComparators):
+        comparators = ColumnComparators(comparators)
+    if stats is not None:
+        started = time.perf_counter()
+    attribute_intersection = set()
+    overrides = {}
+    for attribute_name in additional_data_record:
+        if attribute_name in total_data_record:
+            total_content = total_data_record[attribute_name]
+            merged_content = comparators[attribute_name][1](total_content, additional_data_record[attribute_name])
+            # total_dataset 쪽 값이 그대로 남으면 따로 저장하지 않는다
+            if merged_content is not total_content:
+                overrides[attribute_name] = merged_content
+            attribute_intersection.add(attribute_name)
+    if stats is not None:
+        merged = time.perf_counter()
+        stats.merge_seconds += merged - started
+    joined_record = JoinedRecord(total_data_record, additional_data_record, overrides, attribute_intersection)
+    if stats is not None:
+        stats.copy_seconds += time.perf_counter() - merged
+    return joined_record
+
+
+def _join_matches(additional_data_record, total_dataset, candidate_positions, comparators, stats=None):
+    """
+    additional_dataset의 레코드 하나와 조인 가능한 total_dataset의 레코드들을 찾아 합친다.
+    :param additional_data_record: additional_dataset의 레코드
+    :param total_dataset: total_dataset. 위치로 레코드를 꺼낼 수 있어야 한다.
+    :param candidate_positions: 비교할 total_dataset 레코드 위치들
+    :param comparators: ColumnComparators.
+    :param stats: JoinStats. 주어지면 비교한 쌍의 수와 걸린 시간을 더한다.
+    :return: (total_dataset 레코드 위치, 합친 레코드)의 list
+    """
+    assert isinstance(additional_data_record, Mapping)
+    joined_records = []
+    attribute_names = comparators.ordered(additional_data_record)
+    for position in candidate_positions:
+        total_data_record = total_dataset[position]
+        assert isinstance(total_data_record, Mapping)
+        if stats is not None:
+            stats.pairs_considered += 1
+
+        # addtional_dataset.레코드[i].속성들 X total_dataset.레코드[j].속성들
+        for attribute_name in attribute_names:
+            if attribute_name in total_data_record:
+                # addtional 쪽의 속성이 total 쪽에도 존재하는 경우
+                if stats is None:
+                    is_mergeable = comparators[attribute_name][0](total_data_record[attribute_name],
+                                                                  additional_data_record[attribute_name])
+                else:
+                    started = time.perf_counter()
+                    is_mergeable = comparators[attribute_name][0](total_data_record[attribute_name],
+                                                                  additional_data_record[attribute_name])
+                    stats.equality_seconds[attribute_name] += time.perf_counter() - started
+                if not is_mergeable:
+                    if stats is not None:
+                        stats.pairs_pruned[attribute_name] += 1
+                    break
+            else:
+                # addtional 쪽의 속성이 total 쪽에도 존재하는 경우
+                continue
+        else:
+            # 모든 속성이 mergeable -> 이 두 레코드는 조인 가능함
+            if stats is not None:
+                stats.pairs_matched += 1
+            joined_records.append((position, join_record(total_data_record, additional_data_record, comparators,
+                                                         stats)))
+    return joined_records
+
+
+# 병렬 조인시 fork된 worker 프로세스가 복사 없이 물려받는 조인 인자.
+# (total_dataset, additional_dataset, blocking_index, comparators, 계측 여부)
+_parallel_join_arguments = None
+
+
+def _join_shard(shard):
+    """
+    병렬 조인 worker. additional_dataset의 [start, stop) 구간을 조인한다.
+    :param shard: (start, stop)
+    :return: (additional_dataset 레코드마다 (total_dataset 레코드 위치, overrides, joined_common_attributes)의 list를
+        담은 list, JoinStats 또는 None). 원본 레코드는 부모 프로세스에 있으므로 돌려보내지 않는다.
+    """
+    total_dataset, additional_dataset, blocking_index, comparators, instrumented = _parallel_join_arguments
+    stats = JoinStats() if instrumented else None
+    start, stop = shard
+    shard_matches = []
+    for additional_position in range(start, stop):
+        additional_data_record = additional_dataset[additional_position]
+        joined_records = _join_candidates(additional_data_record, total_dataset, blocking_index,
+                                          comparators, stats)
+        shard_matches.append([(position, joined_record.overrides, joined_record.joined_common_attributes)
+                              for position, joined_record in joined_records])
+    return shard_matches, stats
+
+
+def _join_candidates(additional_data_record, total_dataset, blocking_index, comparators, stats=None):
+    """
+    additional_dataset의 레코드 하나를 색인이 고른 후보 또는 total_dataset 전체와 조인한다.
+    :return: _join_matches()의 결과
+    """
+    if blocking_index is not None:
+        candidate_positions = blocking_index.candidates(additional_data_record)
+    else:
+        candidate_positions = range(len(total_dataset))
+    if stats is not None:
+        stats.pairs_skipped += len(total_dataset) - len(candidate_positions)
+    return _join_matches(additional_data_record, total_dataset, candidate_positions, comparators, stats)
+
+
+def _parallel_join_matches(total_dataset, additional_dataset, blocking_index, comparators, processes,
+                           stats=None):
+    """
+    additional_dataset을 구간으로 나눠 프로세스 풀에서 조인한다.
+    total_dataset 등은 fork로 물려주므로 작업마다 pickle하지 않으며, 합친 레코드의 바뀐 속성만 돌려받는다.
+    :param stats: JoinStats. 주어지면 worker들의 계측 결과를 더한다.
+    :return: additional_dataset 레코드 순서대로 _join_matches()의 결과를 내보내는 generator
+    """
+    global _parallel_join_arguments
+    shard_size = max(1, -(-len(additional_dataset) // (processes * 4)))
+    shards = [(start, min(start + shard_size, len(additional_dataset)))
+              for start in range(0, len(additional_dataset), shard_size)]
+    _parallel_join_arguments = (total_dataset, additional_dataset, blocking_index, comparators,
+                                stats is not None)
+    try:
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+            for (start, _), (shard_matches, shard_stats) in zip(shards, pool.imap(_join_shard, shards)):
+                if stats is not None:
+                    stats.update(shard_stats)
+                for additional_position, matches in enumerate(shard_matches, start):
+                    additional_data_record = additional_dataset[additional_position]
+                    yield [(position, JoinedRecord(total_dataset[position], additional_data_record, overrides,
+                                                   common_attributes))
+                           for position, overrides, common_attributes in matches]
+    finally:
+        _parallel_join_arguments = None
+
+
+class IncrementalJoin(object):
+    """
+    조인 결과를 유지하면서 새로 추가되는 레코드만 조인한다.
+    양쪽 데이터셋에 BlockingIndex를 만들어 두고, 새 레코드와 조인 가능한 상대 레코드만 비교한다.
+    입력 레코드의 has_matched는 바꾸지 않는다. result()는 지금까지 추가된 데이터셋들을 join()한 결과와 같다.
+    """
+    def __init__(self, total_dataset=(), additional_dataset=(), equality_functions=None):
+        """
+        :param total_dataset: DatasetRecord 객체의 리스트 또는 Dataset
+        :param additional_dataset: DatasetRecord 객체의 리스트 또는 Dataset
+        :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+        """
+        self.equality_functions = defaultdict(lambda: None, equality_functions or {})
+        # 나중에 추가될 레코드의 값의 종류를 알 수 없으므로 mergeable(), merge()를 사용한다
+        self.comparators = ColumnComparators(self.equality_functions)
+        self.total_index = BlockingIndex((), self.equality_functions)
+        # total 쪽의 MaskedContent로 후보를 찾을 수 있도록 additional 쪽은 (위치, 문자)도 색인한다
+        self.additional_index = BlockingIndex((), self.equality_functions, positional=True)
+        # additional 레코드 위치 -> {total 레코드 위치: 합친 레코드}
+        self.matches = defaultdict(dict)
+        # total 레코드 위치 -> 조인된 additional 레코드의 수
+        self.total_match_counts = defaultdict(int)
+        self.add_total(total_dataset)
+        self.add_additional(additional_dataset)
+
+    @property
+    def total_dataset(self):
+        return self.total_index.records
+
+    @property
+    def additional_dataset(self):
+        return self.additional_index.records
+
+    def add_additional(self, records):
+        """
+        additional_dataset에 레코드들을 추가하고 조인한다.
+        :param records: DatasetRecord의 iterable.
+        :return: 새로 만들어진 합친 레코드의 list
+        """
+        joined_records = []
+        for additional_data_record in records:
+            additional_position = self.additional_index.add(additional_data_record)
+            candidate_positions = self.total_index.candidates(additional_data_record)
+            for total_position, joined_record in _join_matches(additional_data_record, self.total_dataset,
+                                                               candidate_positions, self.comparators):
+                self._add_match(additional_position, total_position, joined_record)
+                joined_records.append(joined_record)
+        return joined_records
+
+    def add_total(self, records):
+        """
+        total_dataset에 레코드들을 추가하고 조인한다.
+        :param records: DatasetRecord의 iterable.
+        :return: 새로 만들어진 합친 레코드의 list
+        """
+        joined_records = []
+        for total_data_record in records:
+            total_position = self.total_index.add(total_data_record)
+            for additional_position in self.additional_index.candidates(total_data_record):
+                additional_data_record = self.additional_dataset[additional_position]
+                for _, joined_record in _join_matches(additional_data_record, self.total_dataset, (total_position,),
+                                                      self.comparators):
+                    self._add_match(additional_position, total_position, joined_record)
+                    joined_records.append(joined_record)
+        return joined_records
+
+    def _add_match(self, additional_position, total_position, joined_record):
+        joined_record.joined_from = (id(self.total_dataset), id(self.additional_dataset))
+        self.matches[additional_position][total_position] = joined_record
+        self.total_match_counts[total_position] += 1
+
+    def result(self):
+        """
+        :return: 지금까지 추가된 total_dataset과 additional_dataset을 조인해 만든 데이터셋. join()의 결과와 같은 순서이다.
+        """
+        result_set = []
+        for additional_position in range(len(self.additional_dataset)):
+            joined_records = self.matches.get(additional_position)
+            if joined_records:
+                result_set.extend(joined_records[total_position] for total_position in sorted(joined_records))
+
+        # 조인되지 않은 레코드
+        result_set.extend(additional_data_record
+                          for additional_position, additional_data_record in enumerate(self.additional_dataset)
+                          if not self.matches.get(additional_position))
+        result_set.extend(total_data_record for total_position, total_data_record in enumerate(self.total_dataset)
+                          if not self.total_match_counts.get(total_position))
+        return result_set
+
+
+def _collect_joined_records(result_set, all_matches, total_dataset, joined_from, match_log=None):
+    """
+    조인된 레코드들을 result_set에 추가하고 아우터 조인에 사용하기 위해 양쪽 레코드를 매칭된 것으로 표시한다.
+    :param result_set: list. 조인된 레코드를 추가할 결과 데이터셋
+    :param all_matches: (additional_dataset 레코드, _join_matches()의 결과)의 iterable
+    :param total_dataset: total_dataset
+    :param joined_from: 조인된 레코드의 joined_from에 넣을 값
+    :param match_log: 파일 객체. 주어지면 조인된 레코드 쌍의 요약을 모아서 쓴다.
+    """
+    log_lines = []
+    for additional_data_record, joined_records in all_matches:
+        # additional의 레코드와 totals의 레코드들을 조인
+        if joined_records:
+            if match_log is not None:
+                log_lines.append('*' + record_summary(additional_data_record,
+                                                      exclude_attribute=('url', '사진', '페이스북 커버 사진')))
+            for position, joined_record in joined_records:
+                total_data_record = total_dataset[position]
+                result_set.append(joined_record)
+                # 아우터 조인에 사용하기 위해 이미 매칭된 컬럼으로 표시
+                total_data_record.has_matched = True
+                joined_record.joined_from = joined_from
+                # 출력
+                if match_log is not None:
+                    summary = record_summary(total_data_record, exclude_attribute=('url', '사진', '페이스북 커버 사진'))
+                    log_lines.append('  {} -> {}'.format(str(joined_record.joined_common_attributes), summary))
+            if match_log is not None:
+                log_lines.append('')
+                if len(log_lines) >= 1000:
+                    match_log.write('\n'.join(log_lines) + '\n')
+                    log_lines = []
+
+            # 아우터 조인에 사용하기 위해 이미 매칭된 컬럼으로 표시
+            additional_data_record.has_matched = True
+    if log_lines:
+        match_log.write('\n'.join(log_lines) + '\n')
+
+
+def join(total_dataset, additional_dataset, equality_functions=None, blocking=False, vectorized=False,
+         processes=None, stats=None, match_log=None, attribute_order=None):
+    """
+    total_dataset과 addtional_dataset을 조인한 데이터셋을 만든다.
+    :param equality_functions: equality_functions[attribute_name] = function(string1, string2): 두 문자열이 동등한지의 여부
+    :param total_dataset: DatasetRecord 객체의 리스트 또는 Dataset
+    :param additional_dataset: list of DatasetRecord obejct 객체의 리스트 또는 Dataset
+    :param blocking: bool. True이면 total_dataset에 BlockingIndex를 만들어 후보 레코드만 비교한다. 결과는 같다.
+    :param vectorized: bool. True이면 total_dataset을 MaskedColumn으로 인코딩해 후보 레코드를 NumPy로 구한다.
+        결과는 같다. numpy가 필요하다.
+    :param processes: int. 2 이상이면 additional_dataset을 나눠 그 수만큼의 프로세스에서 조인한다.
+        worker는 fork로 total_dataset을 공유하므로 fork를 지원하지 않는 플랫폼에서는 한 프로세스에서 조인한다. 결과는 같다.
+    :param stats: JoinStats. 주어지면 비교한 쌍의 수, 속성별로 제외된 쌍의 수, 비교와 merge, 복사에 걸린 시간을 채운다.
+    :param match_log: 파일 객체. 주어지면 조인된 레코드 쌍의 요약을 모아서 쓴다. 기본값은 쓰지 않는 것이다.
+    :param attribute_order: 레코드 쌍을 비교할 속성명의 순서. 조인되지 않는 쌍을 빨리 제외할 수 있는 속성을 앞에 둔다.
+        None이면 additional_dataset 레코드의 속성 순서로 비교한다. 결과는 같다. e.g. attribute_selectivity()
+    :return: total_dataset과 additional_dataset을 조인해 만든 데이터셋
+    """
+    if stats is not None:
+        started = time.perf_counter()
+    equality_functions = defaultdict(lambda: None, equality_functions or {})
+    if not isinstance(total_dataset, (list, Dataset)):
+        total_dataset = list(total_dataset)
+    if not isinstance(additional_dataset, (list, Dataset)):
+        additional_dataset = list(additional_dataset)
+    if vectorized:
+        blocking_index = VectorizedIndex(total_dataset, equality_functions)
+    elif blocking:
+        blocking_index = BlockingIndex(total_dataset, equality_functions)
+    else:
+        blocking_index = None
+
+    comparators = ColumnComparators(equality_functions, column_kinds(total_dataset), column_kinds(additional_dataset),
+                                    attribute_order)
+
+    if processes is not None and processes > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        all_matches = _parallel_join_matches(total_dataset, additional_dataset, blocking_index, comparators,
+                                             processes, stats)
+    else:
+        all_matches = (_join_candidates(additional_data_record, total_dataset, blocking_index, comparators, stats)
+                       for additional_data_record in additional_dataset)
+
+    result_set = []
+    # additional_dataset 레코드들 X total_dataset 레코드들
+    _collect_joined_records(result_set, zip(additional_dataset, all_matches), total_dataset,
+                            (id(total_dataset), id(additional_dataset)), match_log)
+    all_matches.close()
+
+    # 조인되지 않은 레코드
+    for additional_data_record in additional_dataset:
+        assert isinstance(additional_data_record, Mapping)
+        if not additional_data_record.has_matched:
+            result_set.append(additional_data_record)
+        else:
+            additional_data_record.has_matched = False
+
+    for total_data_record in total_dataset:
+        assert isinstance(total_data_record, Mapping)
+        if not total_data_record.has_matched:
+            result_set.append(total_data_record)
+        else:
+            total_data_record.has_matched = False
+
+    if stats is not None:
+        stats.elapsed_seconds += time.perf_counter() - started
+    return result_set
+
+
+def attribute_selectivity(total_dataset, additional_dataset, comparators=None, sample_size=1000, seed=0):
+    """
+    두 데이터셋의 공통 속성마다 임의로 고른 레코드 쌍을 비교해 통과율과 비교 비용을 추정한다.
+    :param total_dataset: DatasetRecord 객체의 리스트 또는 Dataset
+    :param additional_dataset: DatasetRecord 객체의 리스트 또는 Dataset
+    :param comparators: ColumnComparators. None이면 mergeable()로 비교한다.
+    :param sample_size: int. 속성마다 비교할 레코드 쌍의 수
+    :param seed: 레코드 쌍을 고르는 난수의 seed
+    :return: dict. 속성명 -> (통과율, 비교 한 번의 평균 시간(초)). 통과율은 임의의 레코드 쌍이 그 속성 때문에 제외되지
+        않을 확률이며, 한쪽에 그 속성이 없는 쌍은 통과한다.
+    """
+    comparators = comparators if comparators is not None else ColumnComparators()
+    random_generator = random.Random(seed)
+    # 속성명 -> 그 속성을 가진 레코드 위치들
+    positions = [defaultdict(list), defaultdict(list)]
+    for side, data_set in enumerate((total_dataset, additional_dataset)):
+        for position, record in enumerate(data_set):
+            for attribute_name in record:
+                positions[side][attribute_name].append(position)
+    selectivity = {}
+    for attribute_name in positions[0].keys() & positions[1].keys():
+        total_positions = positions[0][attribute_name]
+        additional_positions = positions[1][attribute_name]
+        attribute_mergeable = comparators[attribute_name][0]
+        passed = 0
+        started = time.perf_counter()
+        for _ in range(sample_size):
+            if attribute_mergeable(total_dataset[random_generator.choice(total_positions)][attribute_name],
+                                   additional_dataset[random_generator.choice(additional_positions)][attribute_name]):
+                passed += 1
+        seconds = (time.perf_counter() - started) / sample_size
+        having_both = len(total_positions) / len(total_dataset) * len(additional_positions) / len(additional_dataset)
+        # 표본에서 한 번도 통과하지 않았어도 0으로 추정하지 않는다
+        selectivity[attribute_name] = (having_both * (passed + 1) / (sample_size + 2) + (1 - having_both), seconds)
+    return selectivity
+
+
+def _attribute_order(selectivity):
+    """
+    :param selectivity: attribute_selectivity()의 결과
+    :return: 한 쌍을 제외하는 데 드는 평균 비용(비교 시간 / 제외될 확률)이 작은 순서의 속성명 list
+    """
+    return sorted(selectivity, key=lambda attribute_name: (
+        selectivity[attribute_name][1] / (1 - selectivity[attribute_name][0])
+        if selectivity[attribute_name][0] < 1 else float('inf')))
+
+
+class LinkPlan(object):
+    """
+    link()가 고른 조인 순서와 단계마다의 속성 비교 순서.
+    steps는 단계마다 다음 키를 가진 dict의 list이다.
+    total(지금까지 조인된 데이터셋들의 이름), additional(조인한 데이터셋의 이름), estimated_matches(추정한 조인된 레코드
+    쌍의 수), matches(조인된 레코드 쌍의 수), result_size(결과 레코드 수), attribute_order(속성 비교 순서),
+    pass_rates(속성명 -> 추정 통과율)
+    """
+    def __init__(self):
+        self.steps = []
+
+    def __str__(self):
+        lines = []
+        for number, step in enumerate(self.steps, start=1):
+            lines.append('{}. {} + {}: estimated {:.1f} matches, {} matched, {} records'.format(
+                number, ' + '.join(step['total']), step['additional'], step['estimated_matches'], step['matches'],
+                step['result_size']))
+            lines.append('   attribute order: {}'.format(', '.join(
+                '{}({:.3f})'.format(attribute_name, step['pass_rates'][attribute_name])
+                for attribute_name in step['attribute_order'])))
+        return '\n'.join(lines)
+
+
+def link(sources, equality_functions=None, sample_size=1000, seed=0, **join_options):
+    """
+    여러 데이터셋을 차례로 조인한다. 처음 주어진 데이터셋에서 시작해, 지금까지의 결과와 속성별 통과율을 표본으로 추정해
+    조인된 레코드 쌍이 가장 적을 것으로 추정되는 데이터셋을 골라 조인한다. 단계마다 속성은 attribute_selectivity()로 구한
+    한 쌍을 제외하는 평균 비용이 작은 순서로 비교한다.
+    처음 주어진 데이터셋이 항상 첫 total_dataset이 되므로 마스킹된 데이터셋을 처음에 둔다.
+    :param sources: dict. 이름 -> 데이터셋. 또는 데이터셋의 list이며 이 경우 위치가 이름이 된다.
+        e.g. {'medical': get_dataset_from_csv('bob_medical.csv'),
+              'facebook': list(iter_dataset_from_sqlite_narrecord_table('facebook.db', 'fb', 'url')),
+              'alumni': get_dataset_from_csv('alumni.csv')}
+    :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+    :param sample_size: int. 속성마다 비교할 표본 레코드 쌍의 수
+    :param seed: 표본을 고르는 난수의 seed
+    :param join_options: join()에 그대로 전달할 인자. e.g. blocking=True
+    :return: (조인해 만든 데이터셋, LinkPlan)
+    """
+    if not isinstance(sources, Mapping):
+        sources = dict(enumerate(sources))
+    sources = {name: data_set if isinstance(data_set, (list, Dataset)) else list(data_set)
+               for name, data_set in sources.items()}
+    names = list(sources)
+    plan = LinkPlan()
+    if not names:
+        return [], plan
+
+    def estimate(total_dataset, additional_dataset):
+        comparators = ColumnComparators(equality_functions, column_kinds(total_dataset),
+                                        column_kinds(additional_dataset))
+        selectivity = attribute_selectivity(total_dataset, additional_dataset, comparators, sample_size, seed)
+        estimated_matches = len(total_dataset) * len(additional_dataset)
+        for pass_rate, _ in selectivity.values():
+            estimated_matches *= pass_rate
+        return estimated_matches, selectivity
+
+    # 마스킹된 값으로 후보를 좁히고 마스킹된 값 전용 비교 함수를 쓸 수 있도록 처음 데이터셋을 total 쪽에 둔다
+    joined_names = [names[0]]
+    result_set = sources[names[0]]
+    remaining = names[1:]
+    if not remaining:
+        return list(result_set), plan
+
+    while True:
+        # 지금까지의 결과와 조인된 쌍이 가장 적을 것으로 추정되는 데이터셋
+        additional_name, (estimated_matches, selectivity) = min(
+            ((name, estimate(result_set, sources[name])) for name in remaining),
+            key=lambda item: item[1][0])
+        additional_dataset = sources[additional_name]
+        attribute_order = _attribute_order(selectivity)
+        result_set = join(result_set, additional_dataset, equality_functions, attribute_order=attribute_order,
+                          **join_options)
+        plan.steps.append({
+            'total': tuple(joined_names),
+            'additional': additional_name,
+            'estimated_matches': estimated_matches,
+            'matches': sum(1 for record in result_set if isinstance(record, JoinedRecord)
+                           and record.joined_from[1] == id(additional_dataset)),
+            'result_size': len(result_set),
+            'attribute_order': attribute_order,
+            'pass_rates': {attribute_name: pass_rate for attribute_name, (pass_rate, _) in selectivity.items()},
+        })
+        joined_names.append(additional_name)
+        remaining.remove(additional_name)
+        if not remaining:
+            break
+    return result_set, plan
+
+
+def visible_ratio(content):
+    """
+    :return: 값에서 마스킹되지 않고 보이는 문자의 비율. MaskedContent가 아니면 1.0, 다중 값이면 그 값들 중 최댓값
+    """
+    if isinstance(content, MaskedContent):
+        return sum(1 for valid in content.valid if valid) / len(content.valid) if content.valid else 0.0
+    elif isinstance(content, (list, tuple, set)):
+        return max((visible_ratio(content_item) for content_item in content), default=0.0)
+    return 1.0
+
+
+def ranked_join(total_dataset, additional_dataset, k=1, equality_functions=None, weights=None, stats=None):
+    """
+    total_dataset의 레코드마다 조인 가능한 additional_dataset의 레코드를 점수가 높은 k개만 골라 조인한다.
+    점수는 공통 속성마다 (가중치 x total 쪽 값에서 보이는 문자의 비율 x 맞는 additional 쪽 값들의 idf 합)을 더한 것이다.
+    idf는 그 값을 가진 additional_dataset 레코드가 적을수록 크므로 드문 값이 맞거나 다중 값의 여러 항목이 맞을수록
+    점수가 높다. 후보마다 모든 값이 맞는다고 할 때의 점수를 상한으로 구해 상한이 높은 순서로 비교하며, 이미 고른 k개 중
+    가장 낮은 점수를 넘을 수 없는 후보가 나오면 남은 후보는 mergeable()로 비교하지 않는다.
+    점수가 같으면 additional_dataset에서 앞에 있는 레코드를 고른다.
+    공통 속성이 없는 레코드 쌍은 조인하지 않으며, 조인되지 않은 레코드는 결과에 넣지 않는다.
+    :param total_dataset: DatasetRecord 객체의 리스트 또는 Dataset. 보통 마스킹된 데이터셋
+    :param additional_dataset: DatasetRecord 객체의 리스트 또는 Dataset
+    :param k: int. total_dataset 레코드마다 남길 최대 레코드 쌍의 수
+    :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+    :param weights: dict. 속성명 -> 가중치. 없는 속성은 1.0
+    :param stats: JoinStats. join()과 같다.
+    :return: 합친 레코드(JoinedRecord)의 list. total_dataset 순서, 같은 레코드 안에서는 점수가 높은 순서이며
+        점수는 JoinedRecord.score에 있다.
+    """
+    if stats is not None:
+        started = time.perf_counter()
+    equality_functions = defaultdict(lambda: None, equality_functions or {})
+    weights = weights or {}
+    if not isinstance(total_dataset, (list, Dataset)):
+        total_dataset = list(total_dataset)
+    if not isinstance(additional_dataset, (list, Dataset)):
+        additional_dataset = list(additional_dataset)
+    # total 쪽의 MaskedContent로 후보를 찾을 수 있도록 (위치, 문자)도 색인한다
+    additional_index = BlockingIndex(additional_dataset, equality_functions, positional=True)
+    comparators = ColumnComparators(equality_functions, column_kinds(total_dataset), column_kinds(additional_dataset))
+    additional_count = len(additional_dataset)
+    joined_from = (id(total_dataset), id(additional_dataset))
+
+    def content_items(content):
+        return content if isinstance(content, (list, tuple, set)) else (content,)
+
+    def value_key(attribute_name, content):
+        # 같은 색인 키를 갖는 문자열은 같은 값으로 센다
+        exact_key = additional_index.attribute_indexes[attribute_name].exact_key
+        if isinstance(content, str):
+            return exact_key(content) if exact_key else content
+        return str(content)
+
+    # 속성명 -> 값(의 색인 키) -> 그 값을 가진 additional_dataset 레코드 수
+    document_frequencies = defaultdict(lambda: defaultdict(int))
+    for additional_data_record in additional_index.records:
+        for attribute_name, content in additional_data_record.items():
+            for key in {value_key(attribute_name, content_item) for content_item in content_items(content)}:
+                document_frequencies[attribute_name][key] += 1
+
+    def idf(attribute_name, content):
+        document_frequency = document_frequencies[attribute_name].get(value_key(attribute_name, content), 0)
+        return math.log((additional_count + 1) / (document_frequency + 1)) + 1
+
+    result_set = []
+    for position in range(len(total_dataset)):
+        total_data_record = total_dataset[position]
+        assert isinstance(total_data_record, Mapping)
+        # additional_dataset에도 있는 속성마다 (속성명, 값, 가중치 x 보이는 문자의 비율, 그 속성을 가진 레코드 위치들)
+        attribute_weights = [(attribute_name, content, weights.get(attribute_name, 1.0) * visible_ratio(content),
+                              additional_index.attribute_indexes[attribute_name].present)
+                             for attribute_name, content in total_data_record.items()
+                             if attribute_name in additional_index.attribute_indexes]
+        if not attribute_weights:
+            continue
+
+        # 후보마다 (-상한, 레코드 위치, 공통 속성마다 (속성명, total 쪽 값, 가중치, additional 쪽 값마다 (값, idf)))
+        bounded = []
+        candidates = additional_index.candidates(total_data_record)
+        skipped = additional_count - len(candidates)
+        for additional_position in candidates:
+            additional_data_record = additional_dataset[additional_position]
+            shared = []
+            for attribute_name, content, weight, present in attribute_weights:
+                if additional_position not in present:
+                    continue
+                items = [(content_item, idf(attribute_name, content_item))
+                         for content_item in content_items(additional_data_record[attribute_name])]
+                shared.append((attribute_name, content, weight, items))
+            # 다중 값의 순서에 따라 점수가 달라지지 않도록 fsum()으로 더한다
+            bound = math.fsum(weight * item_idf for _, _, weight, items in shared for _, item_idf in items)
+            if shared:
+                bounded.append((-bound, additional_position, shared))
+            else:
+                skipped += 1
+        bounded.sort(key=lambda candidate: candidate[:2])
+
+        # 점수가 가장 낮은 것이 맨 앞인 k개 이하의 힙. (점수, -레코드 위치, 합친 레코드)
+        top = []
+        for checked, (negative_bound, additional_position, shared) in enumerate(bounded):
+            # 점수가 같으면 앞의 레코드가 이기므로 (상한, -위치)가 k번째보다 작으면 남은 후보는 모두 넘을 수 없다
+            if len(top) >= k and (not top or (-negative_bound, -additional_position) < top[0][:2]):
+                skipped += len(bounded) - checked
+                break
+            joined_records = _join_matches(additional_dataset[additional_position], total_dataset, (position,),
+                                           comparators, stats)
+            if not joined_records:
+                continue
+            score = math.fsum(weight * item_idf for attribute_name, content, weight, items in shared
+                              for content_item, item_idf in items
+                              if mergeable(content, content_item, equality_functions[attribute_name]))
+            entry = (score, -additional_position, joined_records[0][1])
+            if len(top) < k:
+                heapq.heappush(top, entry)
+            elif entry[:2] > top[0][:2]:
+                heapq.heapreplace(top, entry)
+        if stats is not None:
+            stats.pairs_skipped += skipped
+
+        for score, _, joined_record in sorted(top, key=lambda entry: entry[:2], reverse=True):
+            joined_record.joined_from = joined_from
+            joined_record.score = score
+            result_set.append(joined_record)
+
+    if stats is not None:
+        stats.elapsed_seconds += time.perf_counter() - started
+    return result_set
+
+
+def _write_pickles(file, *objects):
+    for obj in objects:
+        pickle.dump(obj, file, pickle.HIGHEST_PROTOCOL)
+
+
+def _read_pickles(file_name):
+    """
+    _write_pickles()로 쓴 객체들을 하나씩 읽음.
+    """
+    with open(file_name, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                break
+
+
+def _external_partition_key(content, positions):
+    """
+    external_join()에서 값이 들어갈 분할을 정하는 키. mergeable한 두 값은 키가 같다.
+    :param content: 단일 값
+    :param positions: 분할 속성의 모든 MaskedContent에서 보이는 위치들의 오름차순 tuple
+    :return: positions의 문자들의 tuple. 그보다 짧은 일반 문자열은 그 문자열 자체
+    """
+    if isinstance(content, MaskedContent):
+        return tuple(content.content[position] for position in positions)
+    if isinstance(content, DeidentifiedContent):
+        content = content.content
+    if positions and len(content) > positions[-1]:
+        return tuple(content[position] for position in positions)
+    return content
+
+
+def _external_partition_set(record, partition_attribute, positions, partitions):
+    """
+    :return: 레코드가 들어갈 분할 번호의 frozenset. 분할 속성이 없어 모든 분할에 들어가야 하면 None
+    """
+    if partition_attribute is None or partition_attribute not in record:
+        return None
+    content = record[partition_attribute]
+    contents = content if isinstance(content, (list, tuple, set)) else (content,)
+    # 빈 다중 값은 어떤 값과도 mergeable하지 않지만 그 속성이 없는 레코드와는 조인될 수 있다
+    return frozenset(hash(_external_partition_key(content_item, positions)) % partitions
+                     for content_item in contents) or frozenset((0,))
+
+
+def _first_common_partition(partition_set1, partition_set2):
+    """
+    :return: 두 레코드가 함께 들어간 분할 중 가장 작은 번호. 함께 들어간 분할이 없으면 None
+    """
+    if partition_set1 is None:
+        return min(partition_set2) if partition_set2 is not None else 0
+    if partition_set2 is None:
+        return min(partition_set1)
+    return min(partition_set1 & partition_set2, default=None)
+
+
+def _choose_partition_attribute(attribute_statistics, equality_functions, total_count, additional_count):
+    """
+    external_join()에서 분할에 사용할 속성을 고름. 두 데이터셋에 모두 있는 속성 중 분할할 수 있고 속성이 없어
+    모든 분할에 복사되는 레코드가 가장 적은 속성을 고른다.
+    :param attribute_statistics: dict. 속성명 -> {'count': [total, additional], 'plain': [total, additional],
+        'positions': 모든 MaskedContent에서 보이는 위치의 set 또는 None, 'indexable': bool}
+    :return: (속성명, 보이는 위치들의 tuple). 분할할 수 있는 속성이 없으면 (None, ())
+    """
+    best = None
+    for attribute_name, statistic in attribute_statistics.items():
+        if not statistic['indexable'] or not all(statistic['count']):
+            continue
+        positions = statistic['positions']
+        if positions is not None and not positions:
+            # 모든 MaskedContent에서 보이는 위치가 없음
+            continue
+        if equality_functions[attribute_name] is not None and all(statistic['plain']):
+            # 일반 문자열끼리 비교 함수로 비교되므로 문자로 분할할 수 없다
+            continue
+        lacking = (total_count - statistic['count'][0]) + (additional_count - statistic['count'][1])
+        if best is None or lacking < best[0]:
+            best = (lacking, attribute_name, tuple(sorted(positions or ())))
+    if best is None:
+        return None, ()
+    return best[1], best[2]
+
+
+def external_join(total_records, additional_records, sink, equality_functions=None, partitions=64,
+                  memory_budget=100000, partition_attribute=None, directory=None, stats=None):
+    """
+    메모리에 올릴 수 없는 큰 두 데이터셋을 디스크에 나눠 쓴 뒤 조인한다. 결과는 순서를 제외하면 join()과 같다.
+    1. 두 데이터셋을 임시 파일에 쓰면서 분할에 사용할 속성을 고른다.
+    2. 분할 속성 값의 모든 MaskedContent에서 보이는 위치의 문자들(일반 문자열이면 같은 위치의 문자들)의 해시로
+       레코드를 분할 파일들에 나눠 쓴다. 다중 값이면 값마다의 분할에, 분할 속성이 없으면 모든 분할에 쓴다.
+    3. 분할마다 total_records 쪽을 memory_budget개씩 읽어 BlockingIndex를 만들고 additional_records 쪽을 훑으며
+       조인한다. 여러 분할에 함께 들어간 레코드 쌍은 그중 가장 작은 번호의 분할에서만 조인한다.
+    4. 조인되지 않은 레코드를 join()과 같이 additional_records, total_records 순서로 내보낸다.
+    :param total_records: 레코드의 iterable
+    :param additional_records: 레코드의 iterable
+    :param sink: function(record). 결과 레코드를 하나씩 받는다.
+    :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+    :param partitions: int. 분할 수
+    :param memory_budget: int. 한 번에 메모리에 올리는 total_records 쪽 레코드의 최대 수
+    :param partition_attribute: 분할에 사용할 속성명. None이면 자동으로 고른다.
+    :param directory: 임시 파일을 만들 디렉토리. None이면 시스템 기본값
+    :param stats: JoinStats. join()과 같다.
+    :return: int. sink에 내보낸 레코드 수
+    """
+    if stats is not None:
+        started = time.perf_counter()
+    equality_functions = defaultdict(lambda: None, equality_functions or {})
+    joined_from = (id(total_records), id(additional_records))
+    emitted = 0
+    with tempfile.TemporaryDirectory(prefix='reidentify_', dir=directory) as temporary_directory:
+        # 1. 임시 파일에 쓰면서 속성 통계를 모은다
+        attribute_statistics = defaultdict(lambda: {'count': [0, 0], 'plain': [False, False], 'positions': None,
+                                                    'indexable': True, 'kind': [None, None]})
+        spool_names = []
+        counts = []
+        for side, records in enumerate((total_records, additional_records)):
+            spool_names.append(os.path.join(temporary_directory, 'spool{}'.format(side)))
+            count = 0
+            with open(spool_names[side], 'wb') as f:
+                for record in records:
+                    if isinstance(record, DatasetRow):
+                        record = record.dataset.record(record.index)
+                    _write_pickles(f, record)
+                    count += 1
+                    for attribute_name, content in record.items():
+                        statistic = attribute_statistics[attribute_name]
+                        statistic['count'][side] += 1
+                        kind = column_kind(content)
+                        if statistic['kind'][side] is None or statistic['kind'][side] == kind:
+                            statistic['kind'][side] = kind
+                        else:
+                            statistic['kind'][side] = 'generic'
+                        for content_item in content if isinstance(content, (list, tuple, set)) else (content,):
+                            if isinstance(content_item, MaskedContent):
+                                key = visible_key(content_item)
+                                if key is None:
+                                    statistic['indexable'] = False
+                                elif statistic['positions'] is None:
+                                    statistic['positions'] = set(key[0])
+                                else:
+                                    statistic['positions'].intersection_update(key[0])
+                            elif isinstance(content_item, (str, bytes, DeidentifiedContent)):
+                                statistic['plain'][side] = True
+                            else:
+                                statistic['indexable'] = False
+            counts.append(count)
+        if partition_attribute is None:
+            partition_attribute, positions = _choose_partition_attribute(attribute_statistics, equality_functions,
+                                                                         *counts)
+        else:
+            chosen_attribute, positions = _choose_partition_attribute(
+                {partition_attribute: attribute_statistics[partition_attribute]}, equality_functions, *counts)
+            if chosen_attribute is None:
+                raise ValueError('cannot partition by {}'.format(partition_attribute))
+        if partition_attribute is None:
+            partitions = 1
+        comparators = ColumnComparators(
+            equality_functions, *({attribute_name: statistic['kind'][side]
+                                   for attribute_name, statistic in attribute_statistics.items()}
+                                  for side in range(2)))
+
+        # 2. 분할 파일들에 (순번, 분할 번호의 frozenset, 레코드)를 나눠 쓴다
+        partition_names = [[os.path.join(temporary_directory, 'partition{}_{}'.format(side, partition))
+                            for partition in range(partitions)] for side in range(2)]
+        for side in range(2):
+            partition_files = [open(file_name, 'wb') for file_name in partition_names[side]]
+            try:
+                for sequence, record in enumerate(_read_pickles(spool_names[side])):
+                    partition_set = _external_partition_set(record, partition_attribute, positions, partitions)
+                    for partition in range(partitions) if partition_set is None else partition_set:
+                        _write_pickles(partition_files[partition], (sequence, partition_set, record))
+            finally:
+                for f in partition_files:
+                    f.close()
+
+        # 3. 분할마다 block nested loop 조인
+        has_matched = [bytearray(count) for count in counts]
+        for partition in range(partitions):
+            total_partition = _read_pickles(partition_names[0][partition])
+            while True:
+                block = [entry for _, entry in zip(range(memory_budget), total_partition)]
+                if not block:
+                    break
+                block_records = [record for _, _, record in block]
+                blocking_index = BlockingIndex(block_records, equality_functions)
+                for additional_sequence, additional_partition_set, additional_data_record in _read_pickles(
+                        partition_names[1][partition]):
+                    candidate_positions = [
+                        position for position in blocking_index.candidates(additional_data_record)
+                        if _first_common_partition(block[position][1], additional_partition_set) == partition]
+                    for position, joined_record in _join_matches(additional_data_record, block_records,
+                                                                 candidate_positions, comparators, stats):
+                        joined_record.joined_from = joined_from
+                        sink(joined_record)
+                        emitted += 1
+                        has_matched[0][block[position][0]] = True
+                        has_matched[1][additional_sequence] = True
+                if len(block) < memory_budget:
+                    break
+
+        # 4. 조인되지 않은 레코드
+        for side in (1, 0):
+            for sequence, record in enumerate(_read_pickles(spool_names[side])):
+                if not has_matched[side][sequence]:
+                    record.has_matched = False
+                    sink(record)
+                    emitted += 1
+
+    if stats is not None:
+        stats.elapsed_seconds += time.perf_counter() - started
+    return emitted
+
+
+def get_dataset_from_sqlite_narrecord_table(file_name, table_name, id_attribute='id', key_attribute='key',
+                                            value_attribute='value'):
+    """
+    narrow table 형태로 되어 있는 sqlite 테이블을 불러옴.
+    :param file_name: sqlite 데이터베이스 파일 이름
+    :param table_name: 불러올 테이블 이름
+    :param id_attribute: ID로 사용되는 컬럼명
+    :param key_attribute: 속성명으로 사용되는 컬럼명명
+    :param value_attribute: 속성 값으로 사용되는 컬럼명
+    :return: DatasetRecord의 list형태로 되어 있는 데이터셋.
+    """
+    cursor = sqlite3.connect(file_name).cursor()
+    cursor.execute(
+        'SELECT {id}, {key}, {value} FROM {table}'.format(id=id_attribute, key=key_attribute, value=value_attribute,
+                                                          table=table_name))
+    data_set = defaultdict(DatasetRecord)
+    for record_id, key, value in cursor.fetchall():
+        try:
+            data_set[record_id][key].add(value)
+        except KeyError:
+            data_set[record_id][key] = {value}
+
+    return list(data_set.values())
+
+
+def iter_dataset_from_sqlite_narrecord_table(file_name, table_name, id_attribute='id', key_attribute='key',
+                                             value_attribute='value', key_aliases=None, batch_size=1000):
+    """
+    narrow table 형태로 되어 있는 sqlite 테이블에서 레코드를 하나씩 불러옴.
+    ID 순으로 batch_size개의 행씩 가져오며, ID가 바뀌어 완성된 레코드를 바로 내보내므로 테이블 크기와 관계없이 메모리 사용량이 일정하다.
+    모든 레코드를 내보내거나 generator가 닫히면 데이터베이스 연결을 닫는다.
+    :param file_name: sqlite 데이터베이스 파일 이름
+    :param table_name: 불러올 테이블 이름
+    :param id_attribute: ID로 사용되는 컬럼명
+    :param key_attribute: 속성명으로 사용되는 컬럼명
+    :param value_attribute: 속성 값으로 사용되는 컬럼명
+    :param key_aliases: dict. key_aliases[속성명] = 대신 사용할 속성명. 불러오면서 속성명을 통일한다.
+        e.g. {'휴대폰': '전화번호', '기타 전화번호': '전화번호', '학력': '학교'}
+    :param batch_size: int. 한 번에 가져올 행의 수
+    :return: DatasetRecord의 generator.
+    """
+    connection = sqlite3.connect(file_name)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            'SELECT {id}, {key}, {value} FROM {table} ORDER BY {id}'.format(id=id_attribute, key=key_attribute,
+                                                                            value=value_attribute, table=table_name))
+        for _, record in _group_narrecord_rows(_fetch_rows(cursor, batch_size), key_aliases):
+            yield record
+    finally:
+        connection.close()
+
+
+def _fetch_rows(cursor, batch_size=1000):
+    """
+    실행된 cursor의 결과 행들을 batch_size개씩 가져오며 하나씩 내보냄.
+    """
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def _group_narrecord_rows(rows, key_aliases=None):
+    """
+    ID 순으로 정렬된 narrow table의 (ID, 속성명, 속성 값) 행들을 레코드로 묶음.
+    :param rows: (ID, 속성명, 속성 값)의 iterable
+    :param key_aliases: dict. key_aliases[속성명] = 대신 사용할 속성명
+    :return: (ID, DatasetRecord)의 generator.
+    """
+    key_aliases = key_aliases or {}
+    current_id = None
+    record = None
+    for record_id, key, value in rows:
+        if record is None or record_id != current_id:
+            if record is not None:
+                yield current_id, record
+            current_id = record_id
+            record = DatasetRecord()
+        key = key_aliases.get(key, key)
+        try:
+            record[key].add(value)
+        except KeyError:
+            record[key] = {value}
+    if record is not None:
+        yield current_id, record
+
+
+class _RowChecksum(object):
+    """
+    행들의 값으로 순서와 상관없는 체크섬을 구하는 sqlite 집계 함수. 원본 테이블이 바뀌었는지 확인하는 데 사용한다.
+    """
+    def __init__(self):
+        self.checksum = 0
+
+    def step(self, *values):
+        self.checksum = (self.checksum + zlib.crc32(repr(values).encode('utf-8'))) % (1 << 61)
+
+    def finalize(self):
+        return self.checksum
+
+
+def _prepare_narrecord_index_table(connection, table_name, id_attribute, key_attribute, value_attribute,
+                                   key_aliases, track_changes=False):
+    """
+    narrow table을 색인한 보조 테이블 <table_name>_reidentify(id, key, value, rvalue, length, source_rowid)를 만든다.
+    key는 key_aliases로 통일한 속성명이고 rvalue는 뒤집은 값, source_rowid는 원본 행의 rowid이다.
+    (key, value), (key, rvalue), (key, length), (id), (source_rowid)로 색인하며, 만들 때의 컬럼 매핑과 원본 테이블의
+    상태를 <table_name>_reidentify_meta에 기록한다. 컬럼 매핑이 다르면 다시 만든다.
+    track_changes가 False이면 원본 테이블의 행 수, 최대 rowid와 모든 행의 체크섬이 기록과 다를 때 다시 만든다.
+    True이면 원본 테이블에 INSERT, UPDATE, DELETE 트리거를 만들어 바뀐 rowid를 <table_name>_reidentify_changes에
+    기록하고, 호출될 때마다 기록된 행만 보조 테이블에 다시 반영한다.
+    데이터베이스에 쓸 수 없으면 이 연결에서만 사용하는 TEMP 보조 테이블을 만든다.
+    :return: 보조 테이블 이름
+    """
+    index_table = '{}_reidentify'.format(table_name)
+    changes_table = '{}_changes'.format(index_table)
+    meta_table = '{}_meta'.format(index_table)
+    mapping = repr((id_attribute, key_attribute, value_attribute, sorted(key_aliases.items())))
+    triggers = {'{}_{}'.format(index_table, event.lower()): event for event in ('INSERT', 'UPDATE', 'DELETE')}
+    connection.create_function('reidentify_reverse', 1,
+                               lambda value: value[::-1] if isinstance(value, str) else value)
+    connection.create_aggregate('reidentify_checksum', 4, _RowChecksum)
+    alias_case = ''.join(' WHEN ? THEN ?' for _ in key_aliases)
+    alias_parameters = [name for alias in key_aliases.items() for name in alias]
+    insert_sql = ('INSERT INTO {index_table} SELECT {id}, {key_expression}, {value}, reidentify_reverse({value}), '
+                  'length({value}), rowid FROM {table}'.format(
+                      index_table=index_table, id=id_attribute, value=value_attribute, table=table_name,
+                      key_expression='CASE {} {} ELSE {} END'.format(key_attribute, alias_case, key_attribute)
+                      if key_aliases else key_attribute))
+
+    try:
+        built = connection.execute('SELECT mapping, source_rows, source_max_rowid, checksum, track_changes '
+                                   'FROM {}'.format(meta_table)).fetchall()
+    except sqlite3.OperationalError:
+        # 보조 테이블이 없거나 다른 형식으로 만들어졌다
+        built = []
+    existing_triggers = {row[0] for row in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table_name,))}
+
+    if track_changes:
+        signature = (None, None, None)
+        if built == [(mapping, None, None, None, 1)] and existing_triggers.issuperset(triggers):
+            with connection:
+                # 트리거가 기록한 원본 행만 지우고 다시 넣는다
+                connection.execute('DELETE FROM {} WHERE source_rowid IN (SELECT source_rowid FROM {})'.format(
+                    index_table, changes_table))
+                connection.execute(insert_sql + ' WHERE rowid IN (SELECT source_rowid FROM {}) ORDER BY rowid'.format(
+                    changes_table), alias_parameters)
+                connection.execute('DELETE FROM {}'.format(changes_table))
+            return index_table
+    else:
+        signature = tuple(connection.execute(
+            'SELECT count(*), max(rowid), reidentify_checksum(rowid, {}, {}, {}) FROM {}'.format(
+                id_attribute, key_attribute, value_attribute, table_name)).fetchone())
+        if built == [(mapping,) + signature + (0,)]:
+            return index_table
+
+    def build(temporary):
+        with connection:
+            if not temporary:
+                for name in existing_triggers.intersection(triggers):
+                    connection.execute('DROP TRIGGER {}'.format(name))
+                for name in (index_table, changes_table, meta_table):
+                    connection.execute('DROP TABLE IF EXISTS {}'.format(name))
+            connection.execute('CREATE {}TABLE {} (id, key, value, rvalue, length INTEGER, '
+                               'source_rowid INTEGER)'.format('TEMP ' if temporary else '', index_table))
+            connection.execute(insert_sql + ' ORDER BY rowid', alias_parameters)
+            for columns in ('key, value', 'key, rvalue', 'key, length', 'id', 'source_rowid'):
+                connection.execute('CREATE INDEX {table}_{name} ON {table} ({columns})'.format(
+                    table=index_table, name=columns.replace(', ', '_'), columns=columns))
+            if temporary:
+                return
+            if track_changes:
+                # 같은 행이 여러 번 바뀌어도 한 번만 기록한다
+                connection.execute('CREATE TABLE {} (source_rowid INTEGER PRIMARY KEY)'.format(changes_table))
+                for name, event in triggers.items():
+                    # 트리거는 다른 연결에서도 실행되므로 SQL만 사용한다
+                    rowids = {'INSERT': ('new',), 'UPDATE': ('old', 'new'), 'DELETE': ('old',)}[event]
+                    connection.execute('CREATE TRIGGER {name} AFTER {event} ON {table} BEGIN {inserts} END'.format(
+                        name=name, event=event, table=table_name, inserts=' '.join(
+                            'INSERT OR IGNORE INTO {} VALUES ({}.rowid);'.format(changes_table, row)
+                            for row in rowids)))
+            connection.execute('CREATE TABLE {} (mapping TEXT, source_rows INTEGER, source_max_rowid INTEGER, '
+                               'checksum INTEGER, track_changes INTEGER)'.format(meta_table))
+            connection.execute('INSERT INTO {} VALUES (?, ?, ?, ?, ?)'.format(meta_table),
+                               (mapping,) + signature + (int(track_changes),))
+
+    try:
+        build(temporary=False)
+    except sqlite3.OperationalError as e:
+        if 'readonly' not in str(e):
+            raise
+        # 읽기 전용 데이터베이스이면 이 연결에서만 보이는 TEMP 테이블이 원본 데이터베이스의 보조 테이블을 가린다
+        build(temporary=True)
+    return index_table
+
+
+def _prefix_range(column, prefix):
+    """
+    :return: (column 값이 prefix로 시작하는지를 색인으로 찾을 수 있는 SQL 조건, 인자의 list)
+    """
+    if ord(prefix[-1]) == sys.maxunicode:
+        return '{} >= ?'.format(column), [prefix]
+    return '{0} >= ? AND {0} < ?'.format(column), [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+
+
+def _narrecord_value_queries(index_table, attribute_name, content, string_equivalence):
+    """
+    보조 테이블에서 content와 mergeable할 수 있는 값을 가진 ID를 찾는 SQL들을 만든다.
+    SQL들의 결과를 합치면 content와 mergeable한 값을 가진 ID를 모두 포함한다.
+    MaskedContent는 보이는 문자들로 시작하거나(value) 끝나는지(rvalue)를 색인으로 찾고 보이는 위치마다 substr()로 거른다.
+    :param content: total_dataset 레코드의 속성 값
+    :param string_equivalence: 문자열 대 문자열 비교시 사용할 일치 여부 함수
+    :return: (SQL, 인자의 list)의 list. SQL로 찾을 수 없는 값이면 None
+    """
+    select = 'SELECT id FROM {} WHERE key = ? AND '.format(index_table)
+    if isinstance(content, (list, tuple, set)):
+        queries = []
+        for content_item in content:
+            item_queries = _narrecord_value_queries(index_table, attribute_name, content_item, string_equivalence)
+            if item_queries is None:
+                return None
+            queries.extend(item_queries)
+        return queries
+    elif isinstance(content, MaskedContent):
+        key = visible_key(content)
+        if not key or not key[0]:
+            return None
+        positions, chars = key
+        length = len(content.content)
+        checks = ''.join(' AND substr(value, {}, 1) = ?'.format(position + 1) for position in positions)
+        leading = next((index for index, position in enumerate(positions) if index != position), len(positions))
+        trailing = next((index for index, position in enumerate(reversed(positions)) if position != length - 1 - index),
+                        len(positions))
+        if leading >= trailing and leading:
+            condition, parameters = _prefix_range('value', content.content[:leading])
+            return [(select + condition + checks, [attribute_name] + parameters + list(chars))]
+        elif trailing:
+            # 마스킹된 값보다 긴 값도 mergeable하므로 길이가 같은 값만 뒤집은 값으로 찾는다
+            condition, parameters = _prefix_range('rvalue', content.content[:-trailing - 1:-1])
+            return [(select + condition + ' AND length = ?' + checks, [attribute_name] + parameters + [length]
+                     + list(chars)),
+                    (select + 'length > ?' + checks, [attribute_name, length] + list(chars))]
+        return [(select + 'length > ?' + checks, [attribute_name, positions[-1]] + list(chars))]
+    elif isinstance(content, DeidentifiedContent) or (isinstance(content, str) and string_equivalence is None):
+        return [(select + 'value = ?', [attribute_name, str(content)])]
+    return None
+
+
+def join_sqlite_narrecord_table(total_dataset, file_name, table_name, id_attribute='id', key_attribute='key',
+                                value_attribute='value', key_aliases=None, equality_functions=None,
+                                include_unmatched=False, stats=None, match_log=None, track_changes=False):
+    """
+    total_dataset과 narrow table 형태로 되어 있는 sqlite 테이블을 조인한다.
+    테이블을 모두 불러오지 않고 total_dataset 레코드마다 MaskedContent와 일반 문자열 값을 색인된 SQL 조건으로 바꿔
+    후보 ID를 찾은 뒤 후보 레코드만 원본 테이블에서 불러와 mergeable()로 비교한다. 색인을 위해 데이터베이스에 보조 테이블
+    <table_name>_reidentify와 <table_name>_reidentify_meta를 만들어 두며, 데이터베이스에 쓸 수 없으면 이 연결에서만
+    사용하는 TEMP 테이블을 만든다.
+    속성이 없는 레코드는 그 속성에 대해 항상 조인 가능하므로 후보에 포함된다. SQL로 찾을 수 있는 속성이 하나도 없는
+    레코드는 테이블의 모든 레코드와 비교한다.
+    :param total_dataset: DatasetRecord 객체의 리스트 또는 Dataset
+    :param file_name: sqlite 데이터베이스 파일 이름
+    :param table_name: 조인할 테이블 이름
+    :param id_attribute: ID로 사용되는 컬럼명
+    :param key_attribute: 속성명으로 사용되는 컬럼명
+    :param value_attribute: 속성 값으로 사용되는 컬럼명
+    :param key_aliases: dict. key_aliases[속성명] = 대신 사용할 속성명.
+    :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+    :param include_unmatched: bool. True이면 조인되지 않은 테이블의 레코드도 결과에 포함한다. 이 경우 결과는
+        join(total_dataset, iter_dataset_from_sqlite_narrecord_table(...))과 같다. False이면 그 레코드들이 빠진다.
+    :param stats: JoinStats. join()과 같다.
+    :param match_log: 파일 객체. join()과 같다.
+    :param track_changes: bool. False이면 호출할 때마다 원본 테이블 전체의 체크섬으로 보조 테이블이 최신인지 확인한다.
+        True이면 원본 테이블에 INSERT, UPDATE, DELETE 트리거와 바뀐 rowid를 기록하는 <table_name>_reidentify_changes를
+        만들어 바뀐 행만 반영한다. 트리거는 다른 프로그램이 테이블에 쓸 때도 실행된다.
+    :return: 조인해 만든 데이터셋
+    """
+    if stats is not None:
+        started = time.perf_counter()
+    equality_functions = defaultdict(lambda: None, equality_functions or {})
+    if not isinstance(total_dataset, (list, Dataset)):
+        total_dataset = list(total_dataset)
+    connection = sqlite3.connect(file_name)
+    try:
+        index_table = _prepare_narrecord_index_table(connection, table_name, id_attribute, key_attribute,
+                                                     value_attribute, key_aliases or {}, track_changes)
+        # 후보 레코드는 보조 테이블이 아닌 원본 테이블에서 불러온다
+        select_source = 'SELECT {}, {}, {} FROM {} '.format(id_attribute, key_attribute, value_attribute, table_name)
+        # 테이블의 값의 종류는 불러오기 전에는 알 수 없으므로 mergeable(), merge()를 사용한다
+        comparators = ColumnComparators(equality_functions)
+        all_ids = None
+        # 속성명 -> 그 속성을 가진 ID의 set
+        ids_having = {}
+
+        def having(attribute_name):
+            if attribute_name not in ids_having:
+                ids_having[attribute_name] = {row[0] for row in connection.execute(
+                    'SELECT DISTINCT id FROM {} WHERE key = ?'.format(index_table), (attribute_name,))}
+            return ids_having[attribute_name]
+
+        record_count = connection.execute('SELECT count(DISTINCT id) FROM {}'.format(index_table)).fetchone()[0]
+        # 테이블의 레코드 ID -> 레코드. 조인된 레코드만 보관한다
+        matched_records = {}
+        # 테이블의 레코드 ID -> (total_dataset 레코드 위치, 합친 레코드)의 list
+        matches = defaultdict(list)
+        for position in range(len(total_dataset)):
+            total_data_record = total_dataset[position]
+            assert isinstance(total_data_record, Mapping)
+            # 속성마다 (후보 ID 수, 속성명, mergeable할 수 있는 값을 가진 ID의 set)
+            pushed_down = []
+            for attribute_name, content in total_data_record.items():
+                queries = _narrecord_value_queries(index_table, attribute_name, content,
+                                                   equality_functions[attribute_name])
+                if queries is None:
+                    continue
+                found_ids = set()
+                for sql, parameters in queries:
+                    found_ids.update(row[0] for row in connection.execute(sql, parameters))
+                lacking_count = record_count - len(having(attribute_name))
+                pushed_down.append((len(found_ids) + lacking_count, attribute_name, found_ids))
+            if pushed_down:
+                # 후보가 가장 적은 속성으로 후보를 구하고 나머지 속성으로 거른다
+                pushed_down.sort(key=lambda item: item[0])
+                _, attribute_name, candidate_ids = pushed_down[0]
+                if len(having(attribute_name)) < record_count:
+                    if all_ids is None:
+                        all_ids = {row[0] for row in connection.execute(
+                            'SELECT DISTINCT id FROM {}'.format(index_table))}
+                    candidate_ids = candidate_ids | (all_ids - having(attribute_name))
+                for _, attribute_name, found_ids in pushed_down[1:]:
+                    attribute_ids = having(attribute_name)
+                    candidate_ids = {record_id for record_id in candidate_ids
+                                     if record_id in found_ids or record_id not in attribute_ids}
+                candidate_records = [(record_id, matched_records[record_id]) for record_id in candidate_ids
+                                     if record_id in matched_records]
+                missing_ids = sorted(candidate_ids.difference(matched_records))
+                for start in range(0, len(missing_ids), 500):
+                    batch = missing_ids[start:start + 500]
+                    candidate_records.extend(_group_narrecord_rows(connection.execute(
+                        select_source + 'WHERE rowid IN (SELECT source_rowid FROM {} WHERE id IN ({})) '
+                        'ORDER BY {}, rowid'.format(index_table, ', '.join('?' * len(batch)), id_attribute),
+                        batch), key_aliases))
+            else:
+                candidate_ids = None
+                candidate_records = _group_narrecord_rows(_fetch_rows(connection.execute(
+                    select_source + 'ORDER BY {}, rowid'.format(id_attribute))), key_aliases)
+            if stats is not None:
+                stats.pairs_skipped += record_count - (len(candidate_ids) if candidate_ids is not None
+                                                       else record_count)
+
+            for record_id, additional_data_record in candidate_records:
+                additional_data_record = matched_records.get(record_id, additional_data_record)
+                joined_records = _join_matches(additional_data_record, total_dataset, (position,), comparators,
+                                               stats)
+                if joined_records:
+                    matched_records[record_id] = additional_data_record
+                    matches[record_id].extend(joined_records)
+
+        result_set = []
+        # join()과 같이 테이블의 레코드 ID 순서, total_dataset 순서로 추가한다
+        _collect_joined_records(result_set, ((matched_records[record_id], matches[record_id])
+                                             for record_id in sorted(matches)),
+                                total_dataset, (id(total_dataset), id(matched_records)), match_log)
+
+        # 조인되지 않은 레코드
+        if include_unmatched:
+            for record_id, additional_data_record in _group_narrecord_rows(_fetch_rows(connection.execute(
+                    select_source + 'ORDER BY {}, rowid'.format(id_attribute))), key_aliases):
+                if record_id not in matched_records:
+                    result_set.append(additional_data_record)
+        for additional_data_record in matched_records.values():
+            additional_data_record.has_matched = False
+    finally:
+        connection.close()
+
+    for total_data_record in total_dataset:
+        assert isinstance(total_data_record, Mapping)
+        if not total_data_record.has_matched:
+            result_set.append(total_data_record)
+        else:
+            total_data_record.has_matched = False
+
+    if stats is not None:
+        stats.elapsed_seconds += time.perf_counter() - started
+    return result_set
+
+
+def get_dataset_from_csv(file_name):
+    """
+    csv 파일로부터 데이터를 불러옴.
+    :param file_name: csv 파일 이름
+    :return: DatasetRecord의 list형태로 되어 있는 데이터셋.
+    """
+    data_set = []
+    with open(file_name, encoding='utf-8') as f:
+        for record in csv.DictReader(f):
+            data_set.append(DatasetRecord(**record))
+    return data_set
+
+
+def _record_matches_query(data_record, query_dict, equality_functions):
+    for attribute_name, value in query_dict.items():
+        if attribute_name not in data_record:
+            return False
+
+        if not mergeable(data_record[attribute_name], value, equality_functions.get(attribute_name)):
+            return False
+    return True
+
+
+def find(data_set, query_dict, vectorized=False, equality_functions=None):
+    """
+    data_set에서 query_dict와 조인 가능한 레코드를 반환
+    :param data_set: DataRecord의 list 또는 Dataset.
+    :param query_dict: dict.
+    :param vectorized: bool 또는 VectorizedIndex. True이면 일반 문자열과 MaskedContent로만 이루어진 속성을
+        MaskedColumn으로 비교한다. 컬럼을 호출할 때마다 인코딩하므로 여러 번 검색한다면 data_set과 equality_functions로 만든
+        VectorizedIndex를 주어 한 번 인코딩한 컬럼을 사용한다. numpy가 필요하다.
+    :param equality_functions: equality_functions[attribute_name] = function(string1, string2): 두 문자열이 동등한지의 여부
+    :return: DataRecord의 list. 조인 가능한 모든 레코드의 리스트
+    """
+    equality_functions = equality_functions or {}
+    if isinstance(vectorized, VectorizedIndex):
+        data_set = [vectorized.records[position] for position in vectorized.query_candidates(query_dict)]
+    elif vectorized:
+        if numpy is None:
+            raise ImportError('find(vectorized=True) requires numpy')
+        data_set = list(data_set)
+        matched = numpy.ones(len(data_set), dtype=bool)
+        for attribute_name, value in query_dict.items():
+            column = MaskedColumn.from_dataset(data_set, attribute_name)
+            if column is None:
+                continue
+            column_matched = column.match(value, equality_functions.get(attribute_name))
+            if column_matched is not None:
+                matched &= column_matched
+        data_set = [data_set[position] for position in numpy.flatnonzero(matched)]
+
+    result_set = []
+    for data_record in data_set:
+        if _record_matches_query(data_record, query_dict, equality_functions):
+            result_set.append(data_record)
+    result_set.sort(reverse=True,
+                    key=lambda x: len(x.joined_common_attributes))
+    return result_set
+
+
+class QueryIndex(object):
+    """
+    조인된 데이터셋에 대한 검색 색인. 한 번 만들어 두고 find()를 여러 번 할 때 사용한다.
+    속성마다 일반 문자열 값, (위치, 문자), 마스킹 패턴으로 색인하여 질의 값의 후보 레코드 목록들의 교집합만 비교한다.
+    """
+    def __init__(self, data_set, equality_functions=None):
+        """
+        :param data_set: DatasetRecord의 list 또는 Dataset. 보통 join()의 결과
+        :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+        """
+        self.equality_functions = dict(equality_functions or {})
+        self.records = data_set if isinstance(data_set, (list, Dataset)) else list(data_set)
+        self.attribute_indexes = {}
+        for position, record in enumerate(self.records):
+            for attribute_name, content in record.items():
+                try:
+                    attribute_index = self.attribute_indexes[attribute_name]
+                except KeyError:
+                    attribute_index = AttributeIndex(self.equality_functions.get(attribute_name), positional=True)
+                    self.attribute_indexes[attribute_name] = attribute_index
+                attribute_index.add(position, content)
+
+    def candidates(self, query_dict):
+        """
+        query_dict와 조인 가능할 수 있는 레코드 위치들을 구함.
+        :param query_dict: dict.
+        :return: 레코드 위치의 오름차순 list
+        """
+        postings = []
+        for attribute_name, value in query_dict.items():
+            attribute_index = self.attribute_indexes.get(attribute_name)
+            if attribute_index is None:
+                return []
+            probed = attribute_index.probe(value)
+            postings.append(attribute_index.present if probed is None else probed)
+        if not postings:
+            return list(range(len(self.records)))
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates &= posting
+        return sorted(candidates)
+
+    def find(self, query_dict, k=None):
+        """
+        query_dict와 조인 가능한 레코드를 공통 컬럼이 많은 순서로 반환. 결과는 find()와 같다.
+        :param query_dict: dict.
+        :param k: int. 반환할 최대 레코드 수. None이면 모두 반환한다.
+        :return: DataRecord의 list.
+        """
+        matched_records = (self.records[position] for position in self.candidates(query_dict)
+                           if _record_matches_query(self.records[position], query_dict, self.equality_functions))
+        if k is None:
+            return sorted(matched_records, reverse=True, key=lambda x: len(x.joined_common_attributes))
+        return heapq.nlargest(k, matched_records, key=lambda x: len(x.joined_common_attributes))
+
+
+# 저장된 데이터셋 파일의 헤더.
+# (magic, 바이트 순서, 레코드 수, 문자열 수, 문자열 오프셋 위치, 레코드 오프셋 위치, 색인 목록 위치)
+MAPPED_DATASET_MAGIC = b'REIDSET1'
+_MAPPED_HEADER = struct.Struct('<8s8sQQQQQ')
+# 색인 목록의 한 항목. (속성명 문자열 ID, 그리고 present, exact, positional, masked, unindexed 배열의 (위치, 원소 수))
+_MAPPED_INDEX_ENTRY = struct.Struct('<I10Q')
+_MAPPED_STRING, _MAPPED_MASKED, _MAPPED_MULTI = 0, 1, 2
+
+
+def _write_array(f, typecode, values):
+    offset = f.tell()
+    f.write(array(typecode, values).tobytes())
+    return offset
+
+
+def save_dataset(data_set, file_name, index_attributes=None):
+    """
+    데이터셋을 MappedDataset으로 열 수 있는 파일로 저장. 보통 join()의 결과를 저장한다.
+    레코드, joined_common_attributes, MaskedContent의 valid와 함께 속성별 검색 색인을 저장한다.
+    문자열은 한 번만 저장하고 레코드에서는 정렬된 문자열 테이블의 ID로 가리킨다.
+    :param data_set: DatasetRecord의 list 또는 Dataset. 값은 문자열, MaskedContent 또는 그것들의 set이어야 한다.
+    :param file_name: 저장할 파일 이름
+    :param index_attributes: 검색 색인을 만들 속성명들. None이면 모든 속성의 색인을 만든다.
+    """
+    data_set = data_set if isinstance(data_set, (list, Dataset)) else list(data_set)
+    strings = set()
+    for record in data_set:
+        strings.update(record.joined_common_attributes)
+        for attribute_name, content in record.items():
+            strings.add(attribute_name)
+            for content_item in (content if isinstance(content, (list, tuple, set)) else (content,)):
+                if isinstance(content_item, str):
+                    strings.add(content_item)
+                elif isinstance(content_item, MaskedContent):
+                    strings.add(content_item.content)
+                else:
+                    raise TypeError('unsupported content: {!r}'.format(content_item))
+    # UTF-8 바이트 순서로 정렬하여 문자열을 이진 탐색으로 찾을 수 있게 한다
+    encoded_strings = sorted(string.encode('utf-8') for string in strings)
+    string_ids = {string.decode('utf-8'): string_id for string_id, string in enumerate(encoded_strings)}
+
+    def encode_single(content_item):
+        if isinstance(content_item, str):
+            return struct.pack('<BI', _MAPPED_STRING, string_ids[content_item])
+        valid = [bool(valid) for valid in content_item.valid]
+        bits = bytearray((len(valid) + 7) // 8)
+        for index, valid_char in enumerate(valid):
+            if valid_char:
+                bits[index // 8] |= 1 << (index % 8)
+        return struct.pack('<BIBI', _MAPPED_MASKED, string_ids[content_item.content],
+                           content_item.align == 'right', len(valid)) + bytes(bits)
+
+    # 속성명 -> (present, exact, positional, masked, unindexed)
+    indexes = {}
+    with open(file_name, 'wb') as f:
+        f.write(b'\0' * _MAPPED_HEADER.size)
+        strings_offset = _write_array(f, 'Q', [0])
+        string_end = 0
+        for string in encoded_strings:
+            string_end += len(string)
+            f.write(struct.pack('Q', string_end))
+        for string in encoded_strings:
+            f.write(string)
+
+        record_offsets = []
+        for row, record in enumerate(data_set):
+            record_offsets.append(f.tell())
+            common_ids = [string_ids[attribute_name] for attribute_name in record.joined_common_attributes]
+            f.write(struct.pack('<II{}I'.format(len(common_ids)), len(record), len(common_ids), *common_ids))
+            for attribute_name, content in record.items():
+                f.write(struct.pack('<I', string_ids[attribute_name]))
+                if isinstance(content, (list, tuple, set)):
+                    f.write(struct.pack('<BI', _MAPPED_MULTI, len(content)))
+                    for content_item in content:
+                        f.write(encode_single(content_item))
+                else:
+                    f.write(encode_single(content))
+
+                if index_attributes is not None and attribute_name not in index_attributes:
+                    continue
+                index = indexes.setdefault(attribute_name, ([], [], [], [], []))
+                present, exact, positional, masked, unindexed = index
+                present.append(row)
+                for content_item in (content if isinstance(content, (list, tuple, set)) else (content,)):
+                    if isinstance(content_item, str):
+                        exact.append((string_ids[content_item], row))
+                        positional.extend((char_position, ord(char), row)
+                                          for char_position, char in enumerate(content_item))
+                    elif visible_key(content_item) is not None:
+                        if not masked or masked[-1] != row:
+                            masked.append(row)
+                    elif not unindexed or unindexed[-1] != row:
+                        unindexed.append(row)
+        records_offset = _write_array(f, 'Q', record_offsets)
+
+        index_entries = []
+        for attribute_name, (present, exact, positional, masked, unindexed) in indexes.items():
+            entry = [string_ids[attribute_name]]
+            for typecode, items in (('I', present), ('I', [value for pair in sorted(set(exact)) for value in pair]),
+                                    ('I', [value for triple in sorted(set(positional)) for value in triple]),
+                                    ('I', masked), ('I', unindexed)):
+                entry.extend((_write_array(f, typecode, items), len(items)))
+            index_entries.append(entry)
+        indexes_offset = f.tell()
+        f.write(struct.pack('<I', len(index_entries)))
+        for entry in index_entries:
+            f.write(_MAPPED_INDEX_ENTRY.pack(*entry))
+
+        f.seek(0)
+        f.write(_MAPPED_HEADER.pack(MAPPED_DATASET_MAGIC, sys.byteorder.encode('ascii'), len(record_offsets),
+                                    len(encoded_strings), strings_offset, records_offset, indexes_offset))
+
+
+class MappedDataset(object):
+    """
+    save_dataset()으로 저장한 파일을 mmap으로 연 읽기 전용 데이터셋.
+    파일을 열 때는 헤더와 색인 목록만 읽으며, 레코드는 접근할 때마다 DatasetRecord로 만든다.
+    find()는 저장된 색인으로 후보 레코드를 구한 뒤 그 레코드들만 읽어 비교한다.
+    """
+    def __init__(self, file_name):
+        """
+        :param file_name: save_dataset()으로 저장한 파일 이름
+        """
+        self.file_name = file_name
+        with open(file_name, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, byte_order, self.record_count, self.string_count, strings_offset, records_offset,
+         indexes_offset) = _MAPPED_HEADER.unpack_from(self.mmap, 0)
+        if magic != MAPPED_DATASET_MAGIC:
+            raise ValueError('not a saved dataset: {}'.format(file_name))
+        if byte_order.rstrip(b'\0').decode('ascii') != sys.byteorder:
+            raise ValueError('dataset was saved with a different byte order: {}'.format(file_name))
+        view = memoryview(self.mmap)
+        self._string_offsets = view[strings_offset:strings_offset + 8 * (self.string_count + 1)].cast('Q')
+        self._strings_data_offset = strings_offset + 8 * (self.string_count + 1)
+        self._record_offsets = view[records_offset:records_offset + 8 * self.record_count].cast('Q')
+        index_count, = struct.unpack_from('<I', self.mmap, indexes_offset)
+        self.indexes = {}
+        for entry_index in range(index_count):
+            entry = _MAPPED_INDEX_ENTRY.unpack_from(self.mmap,
+                                                    indexes_offset + 4 + entry_index * _MAPPED_INDEX_ENTRY.size)
+            arrays = []
+            for array_offset, item_count in zip(entry[1::2], entry[2::2]):
+                arrays.append(view[array_offset:array_offset + 4 * item_count].cast('I'))
+            self.indexes[self.string(entry[0])] = tuple(arrays)
+
+    def close(self):
+        self._string_offsets = self._record_offsets = None
+        self.indexes = {}
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.record_count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.record_count
+        if not 0 <= index < self.record_count:
+            raise IndexError(index)
+        return self.record(index)
+
+    def __iter__(self):
+        for index in range(self.record_count):
+            yield self.record(index)
+
+    def string(self, string_id):
+        """
+        :param string_id: int. 문자열 ID
+        :return: str.
+        """
+        start = self._strings_data_offset + self._string_offsets[string_id]
+        end = self._strings_data_offset + self._string_offsets[string_id + 1]
+        return self.mmap[start:end].decode('utf-8')
+
+    def string_id(self, string):
+        """
+        :param string: str.
+        :return: int. 문자열 ID. 저장된 문자열이 아니면 None
+        """
+        encoded = string.encode('utf-8')
+        low, high = 0, self.string_count
+        while low < high:
+            middle = (low + high) // 2
+            start = self._strings_data_offset + self._string_offsets[middle]
+            if self.mmap[start:self._strings_data_offset + self._string_offsets[middle + 1]] < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.string_count and self.string(low).encode('utf-8') == encoded:
+            return low
+        return None
+
+    def _value(self, offset):
+        tag, = struct.unpack_from('<B', self.mmap, offset)
+        if tag == _MAPPED_STRING:
+            string_id, = struct.unpack_from('<I', self.mmap, offset + 1)
+            return self.string(string_id), offset + 5
+        if tag == _MAPPED_MASKED:
+            string_id, right, valid_length = struct.unpack_from('<IBI', self.mmap, offset + 1)
+            bits = self.mmap[offset + 10:offset + 10 + (valid_length + 7) // 8]
+            valid = tuple(bool(bits[index // 8] & (1 << (index % 8))) for index in range(valid_length))
+            content = MaskedContent(self.string(string_id), valid, align='right' if right else 'left')
+            return content, offset + 10 + len(bits)
+        count, = struct.unpack_from('<I', self.mmap, offset + 1)
+        offset += 5
+        content = set()
+        for _ in range(count):
+            content_item, offset = self._value(offset)
+            content.add(content_item)
+        return content, offset
+
+    def record(self, index):
+        """
+        :param index: int. 레코드 위치
+        :return: DatasetRecord.
+        """
+        offset = self._record_offsets[index]
+        attribute_count, common_count = struct.unpack_from('<II', self.mmap, offset)
+        common_ids = struct.unpack_from('<{}I'.format(common_count), self.mmap, offset + 8)
+        offset += 8 + 4 * common_count
+        record = DatasetRecord()
+        for _ in range(attribute_count):
+            name_id, = struct.unpack_from('<I', self.mmap, offset)
+            record[self.string(name_id)], offset = self._value(offset + 4)
+        record.joined_common_attributes = {self.string(string_id) for string_id in common_ids}
+        return record
+
+    @staticmethod
+    def _entry_range(entries, width, key):
+        # width개씩 묶인 정렬된 항목들 중 앞부분이 key인 항목들의 범위
+        count = len(entries) // width
+        bounds = []
+        for upper in (False, True):
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                prefix = tuple(entries[middle * width:middle * width + len(key)])
+                if prefix < key or (upper and prefix == key):
+                    low = middle + 1
+                else:
+                    high = middle
+            bounds.append(low)
+        return bounds
+
+    def _probe(self, attribute_name, value, string_equivalence):
+        present, exact, positional, masked, unindexed = self.indexes[attribute_name]
+        if isinstance(value, (list, tuple, set)):
+            candidates = set()
+            for value_item in value:
+                item_candidates = self._probe(attribute_name, value_item, string_equivalence)
+                if item_candidates is None:
+                    return None
+                candidates |= item_candidates
+            return candidates
+        if isinstance(value, str):
+            if string_equivalence is not None:
+                return None
+            string_id = self.string_id(value)
+            candidates = set()
+            if string_id is not None:
+                start, end = self._entry_range(exact, 2, (string_id,))
+                candidates.update(exact[start * 2 + 1:end * 2:2])
+        else:
+            key = visible_key(value)
+            if key is None or not key[0]:
+                return None
+            candidates = None
+            for char_position, char in zip(*key):
+                start, end = self._entry_range(positional, 3, (char_position, ord(char)))
+                rows = set(positional[start * 3 + 2:end * 3:3])
+                candidates = rows if candidates is None else candidates & rows
+                if not candidates:
+                    break
+        candidates.update(masked)
+        candidates.update(unindexed)
+        return candidates
+
+    def candidates(self, query_dict, equality_functions=None):
+        """
+        query_dict와 조인 가능할 수 있는 레코드 위치들을 저장된 색인으로 구함.
+        :param query_dict: dict.
+        :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+        :return: 레코드 위치의 오름차순 list
+        """
+        equality_functions = equality_functions or {}
+        candidates = None
+        for attribute_name, value in query_dict.items():
+            if attribute_name not in self.indexes:
+                continue
+            probed = self._probe(attribute_name, value, equality_functions.get(attribute_name))
+            if probed is None:
+                probed = set(self.indexes[attribute_name][0])
+            candidates = probed if candidates is None else candidates & probed
+        if candidates is None:
+            return list(range(self.record_count))
+        return sorted(candidates)
+
+    def find(self, query_dict, k=None, equality_functions=None):
+        """
+        query_dict와 조인 가능한 레코드를 공통 컬럼이 많은 순서로 반환. 결과는 find()와 같다.
+        :param query_dict: dict.
+        :param k: int. 반환할 최대 레코드 수. None이면 모두 반환한다.
+        :param equality_functions: equality_functions[attribute_name] = function(string1, string2)
+        :return: DatasetRecord의 list.
+        """
+        equality_functions = equality_functions or {}
+        matched_records = (record for record in map(self.record, self.candidates(query_dict, equality_functions))
+                           if _record_matches_query(record, query_dict, equality_functions))
+        if k is None:
+            return sorted(matched_records, reverse=True, key=lambda x: len(x.joined_common_attributes))
+        return heapq.nlargest(k, matched_records, key=lambda x: len(x.joined_common_attributes))
+
+
+class RiskReport(object):
+    """
+    risk_report()의 결과. 준식별자 값이 같아 서로 구별할 수 없는 레코드들을 동등 클래스로 묶어 계산한다.
+    """
+    def __init__(self, quasi_identifiers, sensitive_attribute=None):
+        self.quasi_identifiers = tuple(quasi_identifiers)
+        self.sensitive_attribute = sensitive_attribute
+        # 레코드 수
+        self.record_count = 0
+        # 동등 클래스 수
+        self.class_count = 0
+        # 가장 작은 동등 클래스의 크기. 레코드가 없으면 None
+        self.k_anonymity = None
+        # 동등 클래스에 혼자 속해 준식별자만으로 특정되는 레코드 수
+        self.unique_records = 0
+        # 동등 클래스 안의 서로 다른 민감 속성 값 수의 최솟값. sensitive_attribute가 없거나 그 값을 가진 레코드가 없으면 None
+        self.l_diversity = None
+        # 동등 클래스의 크기 -> 그 크기의 동등 클래스 수
+        self.class_sizes = {}
+
+    def __str__(self):
+        lines = ['quasi identifiers: {}'.format(', '.join(self.quasi_identifiers)),
+                 'records: {}'.format(self.record_count),
+                 'equivalence classes: {}'.format(self.class_count),
+                 'k-anonymity: {}'.format(self.k_anonymity),
+                 'unique records: {}'.format(self.unique_records)]
+        if self.sensitive_attribute is not None:
+            lines.append('l-diversity of {}: {}'.format(self.sensitive_attribute, self.l_diversity))
+        for size, count in sorted(self.class_sizes.items()):
+            lines.append('  classes of size {}: {}'.format(size, count))
+        return '\n'.join(lines)
+
+
+def _risk_key(content, string_equivalence=None):
+    """
+    준식별자 값을 동등 클래스의 키로 바꿈. MaskedContent는 마스킹된 값의 길이와 보이는 위치와 문자로, exact인
+    NormalizedEquality를 비교 함수로 준 일반 문자열은 정규화된 값으로 바꾼다.
+    """
+    if isinstance(content, MaskedContent):
+        # 길이가 다른 마스킹된 값은 서로 구별할 수 있다
+        return len(content.content), visible_key(content) or content.content
+    elif isinstance(content, DeidentifiedContent):
+        return content.content
+    elif isinstance(content, (list, tuple, set)):
+        return frozenset(_risk_key(content_item, string_equivalence) for content_item in content)
+    elif isinstance(string_equivalence, NormalizedEquality) and string_equivalence.exact:
+        normalized = string_equivalence.normalize(content)
+        # 정규화할 수 없는 값은 원래 값으로 묶는다
+        return normalized if normalized is not None else content
+    return content
+
+
+def risk_report(data_set, quasi_identifiers, sensitive_attribute=None, equality_functions=None):
+    """
+    조인하지 않고 마스킹된 데이터셋이 준식별자로 얼마나 재식별될 수 있는지 계산한다.
+    레코드를 한 번 훑으며 준식별자 값(MaskedContent는 보이는 부분)이 같은 레코드들을 해시로 묶어 동등 클래스를 만들고
+    k-anonymity, 특정되는 레코드 수, 민감 속성의 l-diversity를 구한다. 준식별자가 없는 레코드는 그 값이 None인 것으로 본다.
+    민감 속성이 없는 레코드는 l-diversity에 세지 않으며, 민감 속성 값이 하나도 없는 동등 클래스는 l-diversity에서 제외한다.
+    e.g. risk_report(sensitive_medical_dataset, ('이름', '성별', '생년월일', '전화번호', '학교'), '질병')
+    :param data_set: 레코드의 iterable
+    :param quasi_identifiers: 준식별자 속성명들
+    :param sensitive_attribute: 민감 속성명. None이면 l-diversity를 구하지 않는다.
+    :param equality_functions: equality_functions[attribute_name] = function(string1, string2).
+        exact인 NormalizedEquality이면 정규화된 값으로 묶는다.
+    :return: RiskReport.
+    """
+    equality_functions = equality_functions or {}
+    quasi_identifiers = tuple(quasi_identifiers)
+    report = RiskReport(quasi_identifiers, sensitive_attribute)
+    # 동등 클래스의 키 -> [크기, 민감 속성 값들의 set]
+    classes = {}
+    for record in data_set:
+        report.record_count += 1
+        key = tuple(_risk_key(record[attribute_name], equality_functions.get(attribute_name))
+                    if attribute_name in record else None for attribute_name in quasi_identifiers)
+        equivalence_class = classes.get(key)
+        if equivalence_class is None:
+            equivalence_class = classes[key] = [0, set()]
+        equivalence_class[0] += 1
+        if sensitive_attribute is not None and sensitive_attribute in record:
+            equivalence_class[1].add(_risk_key(record[sensitive_attribute]))
+
+    report.class_count = len(classes)
+    class_sizes = defaultdict(int)
+    for size, sensitive_values in classes.values():
+        class_sizes[size] += 1
+        if sensitive_attribute is not None and sensitive_values and (report.l_diversity is None
+                                                                     or len(sensitive_values) < report.l_diversity):
+            report.l_diversity = len(sensitive_values)
+    report.class_sizes = dict(class_sizes)
+    if class_sizes:
+        report.k_anonymity = min(class_sizes)
+    report.unique_records = class_sizes.get(1, 0)
+    return report
+
+
+def collapsed_string(original_string, max_length=15, front_leaving=7, end_leaving=7):
+    """
+    너무 긴 문자열을 ...으로 줄임.
+    :param original_string: 원본 문자열
+    :param max_length: 문자열을 줄이지 않는 최대 길이
+    :param front_leaving: ...의 앞에 남길 길이
+    :param end_leaving: ...의 뒤에 남길 길이
+    :return:
+    """
+    if len(original_string) <= max_length:
+        return original_string
+    return ''.join((original_string[:front_leaving], '...', original_string[front_leaving:][-end_leaving:]))
+
+
+def record_summary(record, exclude_attribute=()):
+    exclude_attribute = set(exclude_attribute)
+    summary = []
+    for attribute_name, attribute_value in record.items():
+        if attribute_name in exclude_attribute:
+            continue
+
+        attribute = attribute_name + ': '
+        if isinstance(attribute_value, set):
+            if len(attribute_value) == 1:
+                attribute += collapsed_string(str(next(iter(attribute_value))))
+            else:
+                attribute += '{' + ','.join(collapsed_string(item) for item in attribute_value) + '}'
+        else:
+            attribute += collapsed_string(str(attribute_value))
+        summary.append(attribute)
+
+    return ', '.join(summary)
+
+
+def print_data(list_of_dict):
+    for index, record in enumerate(list_of_dict, start=1):
+        assert isinstance(record, Mapping)
+        print('#{}'.format(index))
+        for key, values in record.items():
+            print('{}: {}'.format(key, values))
+        print('공통 컬럼: {}'.format(record.joined_common_attributes))
+        print()
+
+
+def load_demo_datasets(medical_file_name='bob_medical.csv', crawl_file_name='facebook.db', crawl_table_name='fb'):
+    """
+    예제 데이터를 불러와 전처리함. 의료 데이터의 이름, 전화번호, 생년월일은 마스킹된 값이다.
+    :return: (의료 데이터셋, 페이스북 크롤링 데이터셋)
+    """
+    sensitive_medical_table = get_dataset_from_csv(medical_file_name)
+    for record in sensitive_medical_table:
+        record['이름'] = MaskedContent(record['이름'], align='left')
+        record['전화번호'] = MaskedContent(record['전화번호'], align='left')
+        record['생년월일'] = MaskedContent(record['생년월일'], align='left')
+        if record['학교'] == '검정고시':
+            del record['학교']
+
+    key_aliases = {'휴대폰': '전화번호', '기타 전화번호': '전화번호', '학력': '학교'}
+    facebook_data = list(iter_dataset_from_sqlite_narrecord_table(crawl_file_name, crawl_table_name, 'url', 'key',
+                                                                  'value', key_aliases=key_aliases))
+    return sensitive_medical_table, facebook_data
+
+
+def demo_equality_functions():
+    """
+    :return: 예제 데이터의 성별, 학교를 비교하는 equality_functions
+    """
+    equility_functions = dict()
+
+    def gender_normalizer(value):
+        # 알 수 없는 값은 None이 되어 어떤 값과도 같지 않다
+        return {'F': 'F', '여성': 'F', 'M': 'M', '남성': 'M'}.get(value)
+
+    def school_normalizer(school):
+        return ''.join(re.findall(r'[a-zA-Z0-9ㄱ-ㅎㅏ-ㅣ가-힣]+', school.lower()))
+
+    def school_equal(school1_stripped, school2_stripped):
+        return school1_stripped in school2_stripped or school2_stripped in school1_stripped
+
+    equility_functions['성별'] = NormalizedEquality(gender_normalizer)
+    equility_functions['학교'] = NormalizedEquality(school_normalizer, school_equal)
+    return equility_functions
+
+
+def query_from_json(query_object):
+    """
+    JSON으로 된 검색 조건을 find()의 query_dict로 바꿈.
+    '*'가 들어 있는 문자열과 {"masked": "정**"}은 MaskedContent, {"plain": "..."}은 '*'가 있어도 일반 문자열,
+    배열은 다중 값이 된다. 배열 안의 배열, 문자열이 아닌 "masked", "plain"과 'left'가 아닌 "align"은 받지 않는다.
+    :param query_object: dict. json.loads()의 결과
+    :return: dict.
+    :raise ValueError: 검색 조건으로 바꿀 수 없는 경우
+    """
+    def content_from_json(value, nested=False):
+        if isinstance(value, list):
+            if nested:
+                raise ValueError('nested array: {!r}'.format(value))
+            return {content_from_json(value_item, nested=True) for value_item in value}
+        elif isinstance(value, dict):
+            if 'masked' in value:
+                if not isinstance(value['masked'], str):
+                    raise ValueError('masked value must be a string: {!r}'.format(value))
+                # 오른쪽 정렬된 MaskedContent는 비교할 수 없다
+                if value.get('align', 'left') != 'left':
+                    raise ValueError("align must be 'left': {!r}".format(value))
+                return MaskedContent(value['masked'], align='left')
+            elif 'plain' in value:
+                if not isinstance(value['plain'], str):
+                    raise ValueError('plain value must be a string: {!r}'.format(value))
+                return value['plain']
+            raise ValueError('unknown value: {!r}'.format(value))
+        elif isinstance(value, str):
+            return MaskedContent(value, align='left') if '*' in value else value
+        raise ValueError('unknown value: {!r}'.format(value))
+
+    if not isinstance(query_object, dict):
+        raise ValueError('query must be an object')
+    return {attribute_name: content_from_json(value) for attribute_name, value in query_object.items()}
+
+
+def record_to_json(record):
+    """
+    레코드를 JSON으로 쓸 수 있는 dict로 바꿈. MaskedContent는 마스킹된 문자열, 다중 값은 정렬된 배열이 되며
+    공통 컬럼은 '공통 컬럼' 키에 넣는다.
+    """
+    json_record = {}
+    for attribute_name, content in record.items():
+        if isinstance(content, (list, tuple, set)):
+            json_record[attribute_name] = sorted(str(content_item) for content_item in content)
+        else:
+            json_record[attribute_name] = str(content)
+    json_record['공통 컬럼'] = sorted(getattr(record, 'joined_common_attributes', ()))
+    return json_record
+
+
+def answer_query(data_set, request, equality_functions=None):
+    """
+    batch 모드와 서버가 받은 검색 요청 하나에 답함.
+    :param data_set: MappedDataset.
+    :param request: dict. 검색 조건 또는 {"query": 검색 조건, "k": 최대 레코드 수}
+    :return: dict. {"count": 레코드 수, "records": record_to_json()의 list}
+    :raise ValueError: 잘못된 요청인 경우
+    """
+    k = None
+    if isinstance(request, dict) and isinstance(request.get('query'), dict):
+        k = request.get('k')
+        if k is not None and (not isinstance(k, int) or isinstance(k, bool) or k < 0):
+            raise ValueError('k must be a non-negative integer: {!r}'.format(k))
+        request = request['query']
+    found_records = data_set.find(query_from_json(request), k=k, equality_functions=equality_functions)
+    return {'count': len(found_records), 'records': [record_to_json(record) for record in found_records]}
+
+
+def _run_batch(data_set, input_file, output_file, equality_functions):
+    """
+    JSON lines로 된 검색 요청들을 한 줄씩 읽어 한 줄씩 답한다. 잘못된 요청에는 {"error": ...}로 답한다.
+    """
+    for line_number, line in enumerate(input_file, start=1):
+        if not line.strip():
+            continue
+        try:
+            answer = answer_query(data_set, json.loads(line), equality_functions)
+        except ValueError as e:
+            answer = {'error': str(e)}
+        answer['line'] = line_number
+        output_file.write(json.dumps(answer, ensure_ascii=False) + '\n')
+    output_file.flush()
+
+
+class _QueryRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    POST /query에 JSON으로 된 검색 요청을 받아 answer_query()의 결과를 JSON으로 답한다.
+    server.data_set과 server.equality_functions를 사용한다.
+    """
+    def do_POST(self):
+        if self.path != '/query':
+            self._reply(404, {'error': 'not found'})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('utf-8'))
+            answer = answer_query(self.server.data_set, request, self.server.equality_functions)
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+            return
+        self._reply(200, answer)
+
+    def _reply(self, status, answer):
+        body = json.dumps(answer, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 요청마다 stderr에 쓰지 않는다
+        pass
+
+
+def make_query_server(data_set, host='127.0.0.1', port=8000, equality_functions=None):
+    """
+    조인된 데이터셋을 열어 둔 채 검색 요청에 답하는 HTTP 서버를 만듦. serve_forever()로 실행한다.
+    :param data_set: MappedDataset.
+    :return: http.server.HTTPServer.
+    """
+    server = http.server.HTTPServer((host, port), _QueryRequestHandler)
+    server.data_set = data_set
+    server.equality_functions = equality_functions
+    return server
+
+
+def run_demo():
+    # cross
+    sensitive_medical_table, facebook_data = load_demo_datasets()
+    equility_functions = demo_equality_functions()
+
+    total_data = join(sensitive_medical_table, facebook_data, equility_functions, blocking=True,
+                      match_log=sys.stdout)
+    # print_data(total_data)
+
+    # search
     # found_records = find(total_data, {'이름': '이수림'})
     found_records = find(total_data, {
         '이름': MaskedContent('정**'),
@@ -479,5 +3207,53 @@ def main():
     # print_data(unique_persons)
 
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='마스킹된 데이터셋 재식별. 인자가 없으면 예제를 실행한다.')
+    subparsers = parser.add_subparsers(dest='command')
+    build_parser = subparsers.add_parser('build', help='예제 데이터를 조인해 save_dataset()으로 저장한다.')
+    build_parser.add_argument('output', help='저장할 파일 이름')
+    build_parser.add_argument('--medical', default='bob_medical.csv', help='의료 데이터 csv 파일')
+    build_parser.add_argument('--crawl', default='facebook.db', help='크롤링 데이터 sqlite 파일')
+    build_parser.add_argument('--table', default='fb', help='크롤링 데이터 테이블 이름')
+    query_parser = subparsers.add_parser('query', help='JSON lines로 된 검색 요청들에 답한다.')
+    query_parser.add_argument('dataset', help='build로 저장한 파일 이름')
+    query_parser.add_argument('--input', default='-', help='검색 요청 파일. -이면 표준 입력')
+    query_parser.add_argument('--output', default='-', help='답을 쓸 파일. -이면 표준 출력')
+    serve_parser = subparsers.add_parser('serve', help='POST /query로 검색 요청에 답하는 HTTP 서버를 실행한다.')
+    serve_parser.add_argument('dataset', help='build로 저장한 파일 이름')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        run_demo()
+    elif args.command == 'build':
+        sensitive_medical_table, facebook_data = load_demo_datasets(args.medical, args.crawl, args.table)
+        total_data = join(sensitive_medical_table, facebook_data, demo_equality_functions(), blocking=True)
+        save_dataset(total_data, args.output)
+        print('{} records -> {}'.format(len(total_data), args.output), file=sys.stderr)
+    elif args.command == 'query':
+        with MappedDataset(args.dataset) as data_set:
+            input_file = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+            output_file = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+            try:
+                _run_batch(data_set, input_file, output_file, demo_equality_functions())
+            finally:
+                if input_file is not sys.stdin:
+                    input_file.close()
+                if output_file is not sys.stdout:
+                    output_file.close()
+    elif args.command == 'serve':
+        with MappedDataset(args.dataset) as data_set:
+            server = make_query_server(data_set, args.host, args.port, demo_equality_functions())
+            print('serving on http://{}:{}/query'.format(*server.server_address[:2]), file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.server_close()
+
+
 if __name__ == '__main__':
     main()
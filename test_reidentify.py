@@ -0,0 +1,285 @@
+import math
+import os
+import random
+import shutil
+import sqlite3
+from collections import defaultdict
+
+import pytest
+
+import reidentify
+from reidentify import DatasetRecord, MaskedContent
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def demo_datasets(monkeypatch):
+    monkeypatch.chdir(HERE)
+    return reidentify.load_demo_datasets()
+
+
+def random_datasets(seed, total_size=30, additional_size=40):
+    """
+    작은 문자 집합으로 된 마스킹된 데이터셋과 일반 문자열(또는 다중 값) 데이터셋을 만든다. 값이 자주 겹치도록 짧게 만든다.
+    """
+    rng = random.Random(seed)
+    attribute_names = ('이름', '전화번호', '학교')
+
+    def plain():
+        return ''.join(rng.choice('ab') for _ in range(rng.randint(1, 3)))
+
+    def masked():
+        return MaskedContent(''.join(char if rng.random() < 0.5 else '*' for char in plain()))
+
+    total_dataset = []
+    for _ in range(total_size):
+        record = DatasetRecord()
+        for attribute_name in attribute_names:
+            if rng.random() < 0.8:
+                record[attribute_name] = masked() if rng.random() < 0.7 else plain()
+        total_dataset.append(record)
+    additional_dataset = []
+    for _ in range(additional_size):
+        record = DatasetRecord()
+        for attribute_name in attribute_names:
+            if rng.random() < 0.8:
+                record[attribute_name] = {plain() for _ in range(rng.randint(1, 2))} if rng.random() < 0.3 else plain()
+        additional_dataset.append(record)
+    return total_dataset, additional_dataset
+
+
+def joined_pairs(total_dataset, additional_dataset, equality_functions):
+    """
+    :return: {(total_dataset 위치, additional_dataset 위치)}. join()으로 조인된 레코드 쌍
+    """
+    total_positions = {id(record): position for position, record in enumerate(total_dataset)}
+    additional_positions = {id(record): position for position, record in enumerate(additional_dataset)}
+    return {(total_positions[id(record.total_record)], additional_positions[id(record.additional_record)])
+            for record in reidentify.join(total_dataset, additional_dataset, equality_functions)
+            if isinstance(record, reidentify.JoinedRecord)}
+
+
+def brute_force_ranking(total_dataset, additional_dataset, k, equality_functions, weights):
+    """
+    조인된 모든 레코드 쌍의 점수를 구해 total_dataset 레코드마다 (점수 내림차순, additional_dataset 위치 오름차순)으로
+    k개를 고른다.
+    :return: total_dataset 위치 -> [(점수, additional_dataset 위치)]
+    """
+    equality_functions = equality_functions or {}
+    index = reidentify.BlockingIndex(additional_dataset, equality_functions)
+
+    def items(content):
+        return content if isinstance(content, (list, tuple, set)) else (content,)
+
+    def key(attribute_name, content):
+        exact_key = index.attribute_indexes[attribute_name].exact_key
+        if isinstance(content, str):
+            return exact_key(content) if exact_key else content
+        return str(content)
+
+    document_frequencies = defaultdict(lambda: defaultdict(int))
+    for record in additional_dataset:
+        for attribute_name, content in record.items():
+            for value_key in {key(attribute_name, item) for item in items(content)}:
+                document_frequencies[attribute_name][value_key] += 1
+    count = len(additional_dataset)
+
+    def score(total_record, additional_record):
+        terms = []
+        for attribute_name, content in total_record.items():
+            if attribute_name not in additional_record:
+                continue
+            weight = weights.get(attribute_name, 1.0) * reidentify.visible_ratio(content)
+            for item in items(additional_record[attribute_name]):
+                if reidentify.mergeable(content, item, equality_functions.get(attribute_name)):
+                    frequency = document_frequencies[attribute_name][key(attribute_name, item)]
+                    terms.append(weight * (math.log((count + 1) / (frequency + 1)) + 1))
+        # 같은 점수는 정확히 같아야 위치로 고르는지 확인할 수 있다
+        return math.fsum(terms)
+
+    ranking = defaultdict(list)
+    for total_position, additional_position in joined_pairs(total_dataset, additional_dataset, equality_functions):
+        total_record = total_dataset[total_position]
+        additional_record = additional_dataset[additional_position]
+        if set(total_record) & set(additional_record):
+            ranking[total_position].append((score(total_record, additional_record), additional_position))
+    return {total_position: sorted(scored, key=lambda item: (-item[0], item[1]))[:k]
+            for total_position, scored in ranking.items() if k > 0}
+
+
+def ranked_join_ranking(total_dataset, additional_dataset, k, equality_functions, weights):
+    total_positions = {id(record): position for position, record in enumerate(total_dataset)}
+    additional_positions = {id(record): position for position, record in enumerate(additional_dataset)}
+    ranking = defaultdict(list)
+    for record in reidentify.ranked_join(total_dataset, additional_dataset, k, equality_functions, weights):
+        ranking[total_positions[id(record.total_record)]].append(
+            (record.score, additional_positions[id(record.additional_record)]))
+    return dict(ranking)
+
+
+def assert_same_ranking(actual, expected):
+    assert sorted(actual) == sorted(expected)
+    for total_position, scored in expected.items():
+        assert [position for _, position in actual[total_position]] == [position for _, position in scored]
+        assert [score for score, _ in actual[total_position]] == [score for score, _ in scored]
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('k', [0, 1, 2, 5])
+def test_ranked_join_matches_brute_force_with_ties(seed, k):
+    total_dataset, additional_dataset = random_datasets(seed)
+    weights = {'전화번호': 2.0} if seed % 2 else {}
+    expected = brute_force_ranking(total_dataset, additional_dataset, k, None, weights)
+    if k > 1:
+        # 짧은 값들이라 같은 점수의 후보가 생기므로 위치 순서로 고르는지도 확인된다
+        assert any(len({round(score, 9) for score, _ in scored}) < len(scored) for scored in expected.values())
+    assert_same_ranking(ranked_join_ranking(total_dataset, additional_dataset, k, None, weights), expected)
+
+
+@pytest.mark.parametrize('k', [1, 3])
+def test_ranked_join_matches_brute_force_on_demo_data(demo_datasets, k):
+    medical_dataset, crawled_dataset = demo_datasets
+    equality_functions = reidentify.demo_equality_functions()
+    expected = brute_force_ranking(medical_dataset, crawled_dataset, k, equality_functions, {})
+    assert_same_ranking(ranked_join_ranking(medical_dataset, crawled_dataset, k, equality_functions, {}), expected)
+
+
+def test_risk_report_separates_mask_lengths_and_skips_missing_sensitive_values():
+    data_set = [DatasetRecord(전화번호=MaskedContent('010-****-1234'), 질병='폐렴'),
+                DatasetRecord(전화번호=MaskedContent('010-***-1234'), 질병='감기'),
+                DatasetRecord(전화번호=MaskedContent('010-***-1234'))]
+    report = reidentify.risk_report(data_set, ('전화번호',), '질병')
+    assert report.class_count == 2
+    assert report.k_anonymity == 1
+    assert report.l_diversity == 1
+
+
+def test_dataset_rows_read_like_records():
+    records = [DatasetRecord(이름='홍길동', 전화번호=MaskedContent('010-****-1234')),
+               DatasetRecord(학교={'가', '나'}),
+               DatasetRecord(전화번호='010-1111-2222', 이름='김철수', 학교='다')]
+    dataset = reidentify.Dataset(records)
+    assert [dict(row) for row in dataset] == [dict(record) for record in records]
+    assert [list(row) for row in dataset] == [list(record) for record in records]
+    with pytest.raises(KeyError):
+        dataset[1]['이름']
+    with pytest.raises(KeyError):
+        dataset[0]['없는 속성']
+    row = dataset[0]
+    row.joined_common_attributes.add('이름')
+    assert dataset[0].joined_common_attributes == {'이름'}
+
+
+def canonical_records(records):
+    """
+    :return: 결과 레코드들을 속성 값과 joined_common_attributes로 비교할 수 있게 바꾼 list. 순서는 유지한다.
+    """
+    def canonical_value(content):
+        if isinstance(content, (list, tuple, set, frozenset)):
+            return tuple(sorted(str(item) for item in content))
+        return str(content)
+
+    return [(tuple((attribute_name, canonical_value(content)) for attribute_name, content in record.items()),
+             tuple(sorted(getattr(record, 'joined_common_attributes', ()))))
+            for record in records]
+
+
+def random_equality_functions(seed):
+    # 정확히 같은지만 보는 비교와 포함 관계를 보는 비교를 번갈아 사용한다
+    if seed % 2:
+        return {'학교': reidentify.NormalizedEquality(str.upper, lambda school1, school2: school1 in school2
+                                                    or school2 in school1)}
+    return {'학교': reidentify.NormalizedEquality(str.upper)}
+
+
+def demo_inputs(seed):
+    medical_dataset, crawled_dataset = reidentify.load_demo_datasets()
+    return medical_dataset, crawled_dataset, reidentify.demo_equality_functions()
+
+
+def random_inputs(seed):
+    total_dataset, additional_dataset = random_datasets(seed)
+    return total_dataset, additional_dataset, random_equality_functions(seed)
+
+
+def incremental_join(total_dataset, additional_dataset, equality_functions):
+    incremental = reidentify.IncrementalJoin((), (), equality_functions)
+    # 양쪽을 번갈아 조금씩 추가한다
+    for start in range(0, max(len(total_dataset), len(additional_dataset)), 7):
+        incremental.add_additional(additional_dataset[start:start + 7])
+        incremental.add_total(total_dataset[start:start + 7])
+    return incremental.result()
+
+
+JOIN_MODES = {
+    'blocking': lambda total_dataset, additional_dataset, equality_functions:
+        reidentify.join(total_dataset, additional_dataset, equality_functions, blocking=True),
+    'vectorized': lambda total_dataset, additional_dataset, equality_functions:
+        reidentify.join(total_dataset, additional_dataset, equality_functions, vectorized=True),
+    'processes': lambda total_dataset, additional_dataset, equality_functions:
+        reidentify.join(total_dataset, additional_dataset, equality_functions, processes=2),
+    'dataset': lambda total_dataset, additional_dataset, equality_functions:
+        reidentify.join(reidentify.Dataset(total_dataset), reidentify.Dataset(additional_dataset), equality_functions),
+    'incremental': incremental_join,
+    'link': lambda total_dataset, additional_dataset, equality_functions:
+        reidentify.link([total_dataset, additional_dataset], equality_functions, blocking=True)[0],
+}
+
+
+@pytest.mark.parametrize('mode', sorted(JOIN_MODES))
+@pytest.mark.parametrize('make_inputs, seed', [(demo_inputs, 0)] + [(random_inputs, seed) for seed in range(6)])
+def test_join_modes_match_join(monkeypatch, mode, make_inputs, seed):
+    if mode == 'vectorized':
+        pytest.importorskip('numpy')
+    monkeypatch.chdir(HERE)
+    expected = canonical_records(reidentify.join(*make_inputs(seed)))
+    assert canonical_records(JOIN_MODES[mode](*make_inputs(seed))) == expected
+
+
+@pytest.mark.parametrize('options', [{}, {'partitions': 1}, {'partitions': 7, 'memory_budget': 5}])
+@pytest.mark.parametrize('make_inputs, seed', [(demo_inputs, 0)] + [(random_inputs, seed) for seed in range(6)])
+def test_external_join_matches_join_up_to_order(monkeypatch, tmp_path, options, make_inputs, seed):
+    monkeypatch.chdir(HERE)
+    expected = canonical_records(reidentify.join(*make_inputs(seed)))
+    total_dataset, additional_dataset, equality_functions = make_inputs(seed)
+    result_set = []
+    emitted = reidentify.external_join(iter(total_dataset), iter(additional_dataset), result_set.append,
+                                       equality_functions, directory=str(tmp_path), **options)
+    assert emitted == len(result_set)
+    assert sorted(canonical_records(result_set), key=repr) == sorted(expected, key=repr)
+
+
+def write_narrecord_table(file_name, data_set):
+    connection = sqlite3.connect(file_name)
+    with connection:
+        connection.execute('CREATE TABLE t (id, key, value)')
+        for position, record in enumerate(data_set):
+            for attribute_name, content in record.items():
+                for item in content if isinstance(content, set) else (content,):
+                    connection.execute('INSERT INTO t VALUES (?, ?, ?)', (position, attribute_name, item))
+    connection.close()
+
+
+@pytest.mark.parametrize('track_changes', [False, True])
+@pytest.mark.parametrize('seed', [None] + list(range(6)))
+def test_sqlite_join_matches_join(monkeypatch, tmp_path, track_changes, seed):
+    monkeypatch.chdir(HERE)
+    file_name = str(tmp_path / 'data.db')
+    if seed is None:
+        # 저장소의 facebook.db는 보조 테이블이 생기지 않도록 복사해서 사용한다
+        shutil.copyfile('facebook.db', file_name)
+        total_dataset, _, equality_functions = demo_inputs(seed)
+        table = ('fb', 'url', 'key', 'value', {'휴대폰': '전화번호', '기타 전화번호': '전화번호', '학력': '학교'})
+    else:
+        total_dataset, additional_dataset, equality_functions = random_inputs(seed)
+        write_narrecord_table(file_name, additional_dataset)
+        table = ('t', 'id', 'key', 'value', None)
+    expected = canonical_records(reidentify.join(
+        total_dataset, reidentify.iter_dataset_from_sqlite_narrecord_table(file_name, *table), equality_functions))
+    # 두 번째 호출은 만들어 둔 보조 테이블을 사용한다
+    for _ in range(2):
+        result_set = reidentify.join_sqlite_narrecord_table(total_dataset, file_name, *table,
+                                                            equality_functions=equality_functions,
+                                                            include_unmatched=True, track_changes=track_changes)
+        assert canonical_records(result_set) == expected